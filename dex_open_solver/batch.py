@@ -0,0 +1,187 @@
+"""Solve many instances in one invocation.
+
+Instances are read from a directory (all *.json files, in name order) or from
+a json lines file (one instance per line, '-' for stdin), and solved in a pool
+of worker processes. Solutions are written as json lines, in the order of the
+instances, each with the name of its instance in the "solver" key.
+
+Instances are read ahead and sent to the workers (which also parse them) while
+previous instances are being solved, keeping at most two instances per worker
+in flight.
+
+Instances that can not be read or solved get a solution with the "error" exit
+status, and the batch goes on. Since the lines of a json lines file can not be
+told apart after a read error, it is the last line read from it.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from argparse import Namespace
+from collections import deque
+from decimal import Decimal as D
+from multiprocessing import Pool
+
+from .core.config import get_config_parameters, set_config_parameters
+from .core.util import LoggerFormatter
+from .strategies import STRATEGIES, solve_instance
+
+logger = logging.getLogger(__name__)
+
+
+def read_instances(instances_path):
+    """Generate (name, instance json, read error) for all instances in a
+    directory or in a json lines file.
+
+    The instance json is None if it could not be read, and the read error
+    None otherwise.
+    """
+    if os.path.isdir(instances_path):
+        for filename in sorted(glob.glob(os.path.join(instances_path, '*.json'))):
+            try:
+                with open(filename, 'r') as instance_file:
+                    yield filename, instance_file.read(), None
+            except (OSError, UnicodeDecodeError) as error:
+                yield filename, None, error
+        return
+
+    line_nr = 0
+    try:
+        if instances_path == '-':
+            instances_file = sys.stdin
+        else:
+            instances_file = open(instances_path, 'r')
+        with instances_file:
+            for line_nr, line in enumerate(instances_file, start=1):
+                if line.strip() != '':
+                    yield f'{instances_path}:{line_nr}', line, None
+    except (OSError, UnicodeDecodeError) as error:
+        yield f'{instances_path}:{line_nr + 1}', None, error
+
+
+def error_solution(name, error, start_time):
+    """Solution json (string) of an instance that could not be read or solved."""
+    return json.dumps({'solver': {
+        'name': 'open',
+        'runtime': time.time() - start_time,
+        'exit_status': 'error',
+        'error': repr(error),
+        'instance': name
+    }})
+
+
+# Strategy and arguments used by a worker process, set once per process by
+# `init_worker`.
+_worker_strategy = None
+_worker_args = None
+
+
+def init_worker(strategy, args, config_parameters, log_level):
+    global _worker_strategy, _worker_args
+    _worker_strategy = strategy
+    _worker_args = args
+    set_config_parameters(config_parameters)
+    handler = logging.StreamHandler()
+    handler.setFormatter(LoggerFormatter(style='{'))
+    logging.basicConfig(level=log_level, style='{', handlers=[handler])
+
+
+def solve_instance_in_worker(name, instance_json):
+    """Solve an instance json (string), returning the solution json (string)."""
+    start_time = time.time()
+    try:
+        instance = json.loads(instance_json, parse_float=D)
+        solution = solve_instance(instance, _worker_strategy, _worker_args, start_time)
+    except Exception as error:
+        logger.exception("Could not solve instance '%s'.", name)
+        return error_solution(name, error, start_time)
+    solution['solver']['instance'] = name
+    logger.info("Solved instance '%s'.", name)
+    return json.dumps(solution)
+
+
+def main(args):
+    if args.strategy == 'token-pair' and args.token_pair is None:
+        raise ValueError("The token-pair strategy requires --token-pair.")
+
+    solver_args = Namespace(
+        token_pair=args.token_pair,
+        xrate=None,
+        time_limit=args.time_limit
+    )
+
+    instances = read_instances(args.instances)
+    with Pool(
+        args.workers,
+        initializer=init_worker,
+        initargs=(
+            args.strategy, solver_args, get_config_parameters(),
+            logging.getLogger().level
+        )
+    ) as pool:
+        # Solutions are written in the order of the instances. Pending
+        # solutions are either being solved, or (if the instance could not be
+        # read) already known.
+        pending = deque()
+        while True:
+            while len(pending) < 2 * args.workers:
+                instance = next(instances, None)
+                if instance is None:
+                    break
+                name, instance_json, read_error = instance
+                if read_error is not None:
+                    logger.error("Could not read instance '%s': %s", name, read_error)
+                    pending.append(error_solution(name, read_error, time.time()))
+                else:
+                    pending.append(pool.apply_async(
+                        solve_instance_in_worker, (name, instance_json)
+                    ))
+
+            if len(pending) == 0:
+                break
+
+            solution = pending.popleft()
+            if not isinstance(solution, str):
+                solution = solution.get()
+            args.output.write(solution + '\n')
+            args.output.flush()
+
+
+def setup_arg_parser(parser):
+    parser.add_argument(
+        'instances',
+        type=str,
+        help="Directory with instance files, or json lines file with one "
+        "instance per line ('-' for stdin)."
+    )
+    parser.add_argument(
+        '--strategy',
+        choices=list(STRATEGIES.keys()),
+        default='best-token-pair',
+        help="Strategy used for solving each instance."
+    )
+    parser.add_argument(
+        '--token-pair',
+        type=str,
+        nargs=2,
+        default=None,
+        help="Token pair (b_buy_token, s_buy_token), for the token-pair strategy."
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes solving instances in parallel."
+    )
+    parser.add_argument(
+        '--output',
+        type=argparse.FileType('w'),
+        default='-',
+        help="File where the solutions are written to, as json lines "
+        "('-' for stdout)."
+    )
+
+    parser.set_defaults(exec_subcommand=main)
@@ -0,0 +1,90 @@
+"""Cheap upper bounds on the objective value of a token pair solution.
+
+The objective of a token pair solution is evaluated over touched orders as
+
+sum_i (2 * u_i - umax_i), with umax_i >= u_i,
+
+hence it is bounded by the sum of the (positive) utilities u_i. The utility of
+an order is at most the value of what it buys, which in turn is at most the value
+of its max sell amount (plus one unit due to integer rounding of sell amounts):
+
+u_i <= p(buy_token) * buy_amount_i <= p(sell_token) * (max_sell_amount_i + 1).
+
+Moreover, since token balances are preserved, the amounts bought of a token are
+bounded by the amounts of that token sold in the token pair.
+
+Only orders that are not trivially unmatchable are considered, and prices are
+bounded from the limit exchange rates of the orders that must be executed in
+any nontrivial solution: an f_order (when b_buy_token is not the fee token)
+bounds the price of b_buy_token, and an s_order bounds the price of s_buy_token
+given the price of b_buy_token.
+"""
+from fractions import Fraction as F
+
+from ..core.config import Config
+from ..token_pair_solver.orderbook import prune_unrealizable_orders
+
+
+def compute_price_upper_bound(sell_token_price_ub, orders, fee):
+    """Upper bound for the price of the token bought by `orders`, given an
+    upper bound for the price of the token they sell, assuming at least one of
+    the orders is executed.
+    """
+    # Executed orders satisfy sell_amount / buy_amount <= max_xrate, where
+    # sell_amount = floor(buy_amount * xrate / (1 - fee)) and buy_amount is at
+    # least the minimum tradable amount.
+    max_xrate = max(order.max_xrate for order in orders)
+    return (1 - fee.value) * sell_token_price_ub \
+        * (max_xrate + F(1, Config.MIN_TRADABLE_AMOUNT))
+
+
+def compute_objective_upper_bound(token_pair, b_orders, s_orders, f_orders, fee):
+    """Upper bound for the objective value of any solution on the token pair.
+
+    b_orders: orders buying b_buy_token, selling s_buy_token
+    s_orders: orders buying s_buy_token, selling b_buy_token
+    f_orders: orders buying b_buy_token, selling the fee token
+    """
+    b_buy_token, s_buy_token = token_pair
+
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return 0
+
+    # Only orders whose limit exchange rates cross can be executed.
+    b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, fee)
+
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return 0
+
+    fee_token_price = Config.FEE_TOKEN_PRICE
+
+    if b_buy_token == fee.token:
+        b_buy_token_price_ub = fee_token_price
+    elif len(f_orders) == 0:
+        return 0
+    else:
+        b_buy_token_price_ub = compute_price_upper_bound(
+            fee_token_price, f_orders, fee
+        )
+
+    if s_buy_token == fee.token:
+        s_buy_token_price_ub = fee_token_price
+    else:
+        s_buy_token_price_ub = compute_price_upper_bound(
+            b_buy_token_price_ub, s_orders, fee
+        )
+
+    b_max_sell_amount = sum(order.max_sell_amount for order in b_orders)
+    s_max_sell_amount = sum(order.max_sell_amount for order in s_orders)
+
+    # b_orders and f_orders buy at most the b_buy_token amount sold by s_orders.
+    bf_utility_ub = b_buy_token_price_ub * s_max_sell_amount
+
+    # s_orders buy at most the s_buy_token amount sold by b_orders, and their
+    # utility is at most the value of their max sell amounts.
+    s_utility_ub = min(
+        s_buy_token_price_ub * b_max_sell_amount,
+        b_buy_token_price_ub * (s_max_sell_amount + len(s_orders))
+    )
+
+    return bf_utility_ub + s_utility_ub
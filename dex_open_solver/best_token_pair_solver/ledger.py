@@ -0,0 +1,120 @@
+"""On-disk ledger of the token pairs evaluated in previous runs.
+
+Allows consecutive (time limited) runs on the same instance, or on a slightly
+different instance, to resume where the previous run stopped.
+
+The ledger is a file with one json object per line (appended as soon as a token
+pair is fully evaluated, so it survives a killed run), holding the objective
+and solution found for a token pair. Entries are keyed by a hash of everything
+the token pair solution depends on: the orders, the balances of their accounts,
+the fee and the solver configuration. The hash of the whole instance is also
+recorded, for reference.
+
+Executed amounts are stored by position of the order in the list
+b_orders + s_orders + f_orders of the token pair, since order ids are not stable
+across instances.
+"""
+import hashlib
+import json
+import logging
+from fractions import Fraction as F
+
+from ..core.config import get_config_parameters
+
+logger = logging.getLogger(__name__)
+
+
+def compute_hash(obj):
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def compute_instance_hash(instance):
+    return compute_hash(instance)
+
+
+def compute_token_pair_key(token_pair, orders, accounts, fee):
+    """Compute the key identifying the problem of solving a token pair.
+
+    orders: list b_orders + s_orders + f_orders of the token pair
+    """
+    tokens = sorted(set(token_pair) | {fee.token})
+    return compute_hash({
+        'token_pair': token_pair,
+        'orders': [
+            (
+                order.account_id, order.buy_token, order.sell_token,
+                order.max_sell_amount, order.max_xrate
+            )
+            for order in orders
+        ],
+        'balances': {
+            order.account_id: [
+                accounts[order.account_id].get(token, 0) for token in tokens
+            ]
+            for order in orders
+        },
+        'fee': fee,
+        'config': get_config_parameters()
+    })
+
+
+def load_ledger(ledger_filename):
+    """Load ledger entries as a dict of {token_pair_key: entry}.
+
+    Returns an empty dict if the file does not exist. Lines that can not be
+    parsed (e.g. partially written by a killed run) are ignored.
+    """
+    entries = {}
+    try:
+        with open(ledger_filename, 'r') as ledger_file:
+            for line in ledger_file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Ignoring invalid ledger entry: %s", line)
+                    continue
+                entries[entry['key']] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def record_token_pair(
+    ledger_filename, instance_hash, token_pair_key, token_pair,
+    objective, solution, orders
+):
+    """Append the objective and solution of a (fully evaluated) token pair.
+
+    orders: list b_orders + s_orders + f_orders of the token pair
+    """
+    solution_orders, prices = solution
+    order_positions = {order.id: position for position, order in enumerate(orders)}
+    entry = {
+        'instance': instance_hash,
+        'key': token_pair_key,
+        'token_pair': token_pair,
+        'objective': str(objective),
+        'prices': {token: str(price) for token, price in prices.items()},
+        'executions': [
+            (order_positions[order.id], str(order.buy_amount), str(order.sell_amount))
+            for order in solution_orders
+        ]
+    }
+    with open(ledger_filename, 'a') as ledger_file:
+        ledger_file.write(json.dumps(entry) + '\n')
+
+
+def restore_token_pair(entry, orders):
+    """Return the (objective, solution) of a token pair recorded in the ledger.
+
+    orders: list b_orders + s_orders + f_orders of the token pair
+    """
+    solution_orders = []
+    for position, buy_amount, sell_amount in entry['executions']:
+        order = orders[position].with_buy_amount(int(buy_amount))
+        order.sell_amount = int(sell_amount)
+        solution_orders.append(order)
+    prices = {token: int(price) for token, price in entry['prices'].items()}
+    return F(entry['objective']), (solution_orders, prices)
@@ -0,0 +1,74 @@
+"""Scheduling of the token pairs to be solved.
+
+Each token pair is assigned an estimated (solve) cost, from the number of
+orders involved, and a value, the upper bound of its objective (see bound.py).
+
+Only the best token pair solution is kept, so the aim is to reach a high
+objective early: it prunes the remaining pairs whose upper bound is lower, and
+it is what is returned if the time limit expires. Hence pairs are visited in
+decreasing order of value, except that, under a time limit, pairs that are not
+predicted to be solved in time are deferred after the others: they would be
+interrupted anyway, and would delay the pairs after them.
+"""
+from ..token_pair_solver.orderbook import prune_unrealizable_orders
+
+# Coefficients of the cost model, in seconds:
+# cost = c + c_bs * nr_bs + c_f * nr_f + c_bsf * nr_bs * nr_f
+# where nr_bs is the number of b_orders and s_orders that are not trivially
+# unmatchable, and nr_f is the number of f_orders. Least squares fit (R^2 = 0.93)
+# of the runtimes of the 187 token pairs of the e2e test instances, solved one at
+# a time. Predicted and actual costs are both logged, for recalibration.
+COST_CONSTANT = 1e-3
+COST_PER_BS_ORDER = 6e-4
+COST_PER_F_ORDER = 1e-5
+COST_PER_BS_F_ORDER_PAIR = 4e-5
+
+
+def estimate_token_pair_cost(b_orders, s_orders, f_orders, fee):
+    """Estimate the time (in seconds) it takes to solve a token pair.
+
+    b_orders: orders buying b_buy_token, selling s_buy_token
+    s_orders: orders buying s_buy_token, selling b_buy_token
+    f_orders: orders buying b_buy_token, selling the fee token
+    """
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return COST_CONSTANT
+
+    b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, fee)
+    nr_bs_orders = len(b_orders) + len(s_orders)
+    nr_f_orders = len(f_orders)
+
+    return COST_CONSTANT \
+        + COST_PER_BS_ORDER * nr_bs_orders \
+        + COST_PER_F_ORDER * nr_f_orders \
+        + COST_PER_BS_F_ORDER_PAIR * nr_bs_orders * nr_f_orders
+
+
+def schedule_token_pairs(token_pairs, objective_ubs, costs, time_budget=None):
+    """Sort token pairs in the order they should be solved.
+
+    objective_ubs: dict of {token_pair: upper bound of the objective}
+    costs: dict of {token_pair: estimated cost}
+    time_budget: time available to solve token pairs (in seconds), if limited
+
+    Token pairs are sorted by decreasing objective upper bound (and then by
+    increasing cost). Given a time budget, the token pairs whose cost exceeds
+    what is left of it after solving the ones before them are moved to the end
+    (in the same order), and do not use up the budget.
+    """
+    def priority(token_pair):
+        return (-objective_ubs[token_pair], costs[token_pair])
+
+    # Token pairs are sorted first so that ties are broken deterministically.
+    token_pairs = sorted(sorted(token_pairs), key=priority)
+    if time_budget is None:
+        return token_pairs
+
+    scheduled_token_pairs, deferred_token_pairs = [], []
+    for token_pair in token_pairs:
+        if costs[token_pair] <= time_budget:
+            scheduled_token_pairs.append(token_pair)
+            time_budget -= costs[token_pair]
+        else:
+            deferred_token_pairs.append(token_pair)
+    return scheduled_token_pairs + deferred_token_pairs
@@ -1,15 +1,24 @@
+import argparse
 import json
 import logging
 import time
 from copy import deepcopy
 from decimal import Decimal as D
-from functools import reduce
-from random import shuffle
+from multiprocessing import Pool
+from queue import Empty, Queue
 
 from ..core.api import IntegerTraits, Stats, dump_solution, load_problem
-from ..core.orderbook import compute_objective, update_accounts
+from ..core.config import get_config_parameters, set_config_parameters
+from ..core.orderbook import (compute_best_limit_xrates, compute_objective,
+                              copy_accounts, index_orders_by_token_pair,
+                              snapshot_solution, update_accounts)
+from ..core.util import Deadline
 from ..token_pair_solver.solver import \
     solve_token_pair_and_fee_token_economic_viable
+from .bound import compute_objective_upper_bound
+from .ledger import (compute_instance_hash, compute_token_pair_key, load_ledger,
+                     record_token_pair, restore_token_pair)
+from .schedule import estimate_token_pair_cost, schedule_token_pairs
 
 logger = logging.getLogger(__name__)
 
@@ -17,51 +26,60 @@ logger = logging.getLogger(__name__)
 TRIVIAL_SOLUTION = ([], {})
 
 
-def match_token_pair(token_pair, accounts, orders, fee):
-    b_buy_token, s_buy_token = token_pair
+def select_token_pair_orders(token_pair, order_index, fee):
+    """Select the orders relevant for matching a token pair.
 
-    b_orders = [
-        order for order in orders
-        if order.buy_token == b_buy_token and order.sell_token == s_buy_token
-    ]
-    if len(b_orders) == 0:
-        return TRIVIAL_SOLUTION
+    Returns (b_orders, s_orders, f_orders) where
+    b_orders: orders buying b_buy_token, selling s_buy_token
+    s_orders: orders buying s_buy_token, selling b_buy_token
+    f_orders: orders buying b_buy_token, selling fee (empty if b_buy_token is fee)
+    """
+    b_buy_token, s_buy_token = token_pair
 
-    s_orders = [
-        order for order in orders
-        if order.buy_token == s_buy_token and order.sell_token == b_buy_token
-    ]
-
-    if len(s_orders) == 0:
-        return TRIVIAL_SOLUTION
+    b_orders = order_index.get((b_buy_token, s_buy_token), [])
+    s_orders = order_index.get((s_buy_token, b_buy_token), [])
 
     if b_buy_token != fee.token:
-        f_orders = [
-            order for order in orders
-            if order.buy_token == b_buy_token and order.sell_token == fee.token
-        ]
-        if len(f_orders) == 0:
-            return TRIVIAL_SOLUTION
+        f_orders = order_index.get((b_buy_token, fee.token), [])
     else:
         f_orders = []
 
+    return b_orders, s_orders, f_orders
+
+
+def match_token_pair(token_pair, accounts, order_index, fee, deadline=None):
+    b_buy_token, s_buy_token = token_pair
+
+    b_orders, s_orders, f_orders = select_token_pair_orders(
+        token_pair, order_index, fee
+    )
+
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return TRIVIAL_SOLUTION
+
+    if b_buy_token != fee.token and len(f_orders) == 0:
+        return TRIVIAL_SOLUTION
+
     # Find token pair + fee token matching.
     orders, prices = solve_token_pair_and_fee_token_economic_viable(
-        token_pair, accounts, b_orders, s_orders, f_orders, fee
+        token_pair, accounts, b_orders, s_orders, f_orders, fee,
+        deadline=deadline
     )
     return (orders, prices)
 
 
 def match_token_pair_and_evaluate(
-    token_pair, accounts, orders, fee, touched_only=False
+    token_pair, accounts, order_index, fee, touched_only=False, deadline=None
 ):
     """If touched_only=true, then evaluate objective over touched orders only."""
 
     # Compute current token pair solution: buy/sell amounts and best prices.
-    orders, prices = match_token_pair(token_pair, accounts, orders, fee)
+    orders, prices = match_token_pair(
+        token_pair, accounts, order_index, fee, deadline=deadline
+    )
 
     # Update accounts for current token pair solution.
-    accounts_updated = deepcopy(accounts)
+    accounts_updated = copy_accounts(accounts)
     update_accounts(accounts_updated, orders)
 
     # Compute objective value for current token pair solution.
@@ -74,60 +92,369 @@ def match_token_pair_and_evaluate(
     return (objective, (orders, prices))
 
 
-def eligible_token_pairs(orders, fee_token):
-    # Set of tokens directly connected to fee token (except fee).
-    directly_connected_tokens = {
-        o.buy_token for o in orders if o.sell_token == fee_token
-    }
+def eligible_token_pairs(order_index, fee):
+    """Generate the token pairs (b_buy_token, s_buy_token) that may have a
+    nontrivial solution.
 
-    # A set with all tokens.
-    all_tokens = reduce(lambda x, y: x | y, (o.tokens for o in orders), set())
+    These are the token pairs not including fee as s_buy_token, where:
+    * there are both b_orders and s_orders,
+    * the limit xrates of b_orders and s_orders cross (considering the fee),
+    * there are f_orders, unless b_buy_token is the fee token.
+    """
+    best_limit_xrates = compute_best_limit_xrates(order_index)
+    f2 = (1 - fee.value) ** 2
 
-    # All permutations that do not include fee, and where the first
-    # token in the token pair is directly connected to fee.
-    for b_token in directly_connected_tokens:
-        for s_token in all_tokens - {b_token, fee_token}:
-            yield (b_token, s_token)
+    for (b_buy_token, s_buy_token), b_max_xrate in best_limit_xrates.items():
+        if s_buy_token == fee.token:
+            continue
 
-    # All permutations where the first token is the fee token.
-    for s_token in all_tokens - {fee_token}:
-        yield (fee_token, s_token)
+        if b_buy_token != fee.token and \
+           (b_buy_token, fee.token) not in best_limit_xrates:
+            continue
 
+        s_max_xrate = best_limit_xrates.get((s_buy_token, b_buy_token))
+        if s_max_xrate is None:
+            continue
 
-def main(args):
-    start_time = time.time()
+        # Same condition as in prune_unrealizable_orders.
+        if b_max_xrate * s_max_xrate * f2 < 1:
+            continue
 
-    # Load dict from json.
-    instance = json.load(args.instance, parse_float=D)
+        yield (b_buy_token, s_buy_token)
 
-    # Load problem.
-    accounts, orders, fee = load_problem(instance)
 
-    # Find token pair + fee token matching.
-    # TODO: parallelize this loop.
-    best_objective = 0
-    best_solution = TRIVIAL_SOLUTION
+def compute_token_pair_objective_upper_bound(token_pair, order_index, fee):
+    return compute_objective_upper_bound(
+        token_pair, *select_token_pair_orders(token_pair, order_index, fee), fee
+    )
+
+
+def select_token_pair_order_list(token_pair, order_index, fee):
+    """Return the list b_orders + s_orders + f_orders of a token pair."""
+    b_orders, s_orders, f_orders = select_token_pair_orders(token_pair, order_index, fee)
+    return b_orders + s_orders + f_orders
+
+
+def compute_token_pair_cost(token_pair, order_index, fee):
+    return estimate_token_pair_cost(
+        *select_token_pair_orders(token_pair, order_index, fee), fee
+    )
+
+
+def log_token_pair_cost(token_pair, predicted_cost, actual_cost):
+    logger.debug(
+        "Token pair %s solved in %.3fs (predicted: %.3fs).",
+        token_pair, actual_cost, predicted_cost
+    )
+
+
+def can_improve(objective_ub, best_objective):
+    """Check if a token pair with the given objective upper bound can improve
+    the best objective found so far."""
+    return best_objective is None or objective_ub > best_objective
+
 
-    # Shuffle token pairs so that the open solver has a chance
-    # to solve an instance in consecutive batches in the
-    # case the timeout is limiting each run to complete.
-    token_pairs = list(eligible_token_pairs(orders, fee.token))
-    shuffle(token_pairs)
+def solve_token_pairs_sequentially(
+    token_pairs, objective_ubs, accounts, order_index, fee, deadline,
+    on_token_pair_solved,
+    best_objective=0,
+    best_solution=TRIVIAL_SOLUTION
+):
+    """Find the token pair solution with highest objective, one pair at a time,
+    starting from the given best objective and solution.
+
+    Token pairs whose objective upper bound can not improve the best objective
+    found so far are skipped. The deadline is also passed to the token pair
+    solver, so that the token pair being solved when it expires returns the
+    best solution it found so far.
+
+    Calls on_token_pair_solved(token_pair, objective, solution, runtime)
+    for every token pair solved.
+    """
     for token_pair in token_pairs:
+        if not can_improve(objective_ubs[token_pair], best_objective):
+            logger.debug("Skipping token pair %s (objective bound).", token_pair)
+            continue
+        token_pair_start_time = time.time()
         objective, solution = match_token_pair_and_evaluate(
-            token_pair, accounts, orders, fee, touched_only=True
+            token_pair, accounts, order_index, fee, touched_only=True,
+            deadline=deadline
+        )
+        on_token_pair_solved(
+            token_pair, objective, solution, time.time() - token_pair_start_time
         )
         if best_objective is None or objective > best_objective:
             best_objective = objective
-            best_solution = deepcopy(solution)
-        if hasattr(args, 'time_limit') and \
-           args.time_limit is not None and \
-           args.time_limit < time.time() - start_time:
+            best_solution = snapshot_solution(solution)
+        if deadline.is_expired():
             logging.warning("Time limit reached - leaving.")
             break
 
+    return best_objective, best_solution
+
+
+# Problem being solved by a worker process, set once per process by `init_worker`
+# so that only token pairs and solutions need to be sent between processes.
+_worker_problem = None
+
+
+def init_worker(problem, config_parameters):
+    global _worker_problem
+    _worker_problem = problem
+    set_config_parameters(config_parameters)
+
+
+def match_token_pair_and_evaluate_in_worker(token_pair):
+    """Returns the token pair, the time it took to solve, and its
+    (objective, solution)."""
+    accounts, order_index, fee, deadline = _worker_problem
+    start_time = time.time()
+    result = match_token_pair_and_evaluate(
+        token_pair, accounts, order_index, fee, touched_only=True,
+        deadline=deadline
+    )
+    return token_pair, time.time() - start_time, result
+
+
+def solve_token_pairs_in_parallel(
+    token_pairs, objective_ubs, accounts, order_index, fee, deadline,
+    on_token_pair_solved,
+    nr_workers,
+    best_objective=0,
+    best_solution=TRIVIAL_SOLUTION
+):
+    """Find the token pair solution with highest objective, evaluating token
+    pairs in a pool of `nr_workers` processes, starting from the given best
+    objective and solution.
+
+    Token pairs are submitted to the pool in order, keeping at most two
+    token pairs per worker in flight. Token pairs whose objective upper bound
+    can not improve the best objective found so far are not submitted. Workers
+    stop solving their token pairs when the deadline expires, and are
+    terminated if they do not return in time.
+
+    Calls on_token_pair_solved(token_pair, objective, solution, runtime)
+    for every token pair solved.
+    """
+
+    # Results (or errors) are pushed by the pool's result handler thread.
+    results = Queue()
+
+    def on_result(result):
+        results.put((True, result))
+
+    def on_error(error):
+        results.put((False, error))
+
+    with Pool(
+        nr_workers,
+        initializer=init_worker,
+        initargs=((accounts, order_index, fee, deadline), get_config_parameters())
+    ) as pool:
+        token_pairs = iter(token_pairs)
+        nr_pending = 0
+        while True:
+            # Keep workers busy.
+            while nr_pending < 2 * nr_workers:
+                token_pair = next(token_pairs, None)
+                if token_pair is None:
+                    break
+                if not can_improve(objective_ubs[token_pair], best_objective):
+                    logger.debug("Skipping token pair %s (objective bound).", token_pair)
+                    continue
+                pool.apply_async(
+                    match_token_pair_and_evaluate_in_worker, (token_pair, ),
+                    callback=on_result, error_callback=on_error
+                )
+                nr_pending += 1
+
+            if nr_pending == 0:
+                break
+
+            try:
+                succeeded, result = results.get(timeout=deadline.remaining())
+            except Empty:
+                logging.warning("Time limit reached - leaving.")
+                break
+            nr_pending -= 1
+
+            if not succeeded:
+                raise result
+
+            token_pair, runtime, (objective, solution) = result
+            on_token_pair_solved(token_pair, objective, solution, runtime)
+            if best_objective is None or objective > best_objective:
+                best_objective = objective
+                best_solution = solution
+            if deadline.is_expired():
+                logging.warning("Time limit reached - leaving.")
+                break
+
+    return best_objective, best_solution
+
+
+def write_token_pair_result(results_file, token_pair, objective, runtime):
+    """Write the result of solving a token pair as a json line."""
+    results_file.write(json.dumps({
+        'token_pair': token_pair,
+        'objective': str(objective),
+        'runtime': runtime
+    }) + '\n')
+    results_file.flush()
+
+
+def solve_instance(instance, args, start_time=None):
+    """Match orders on the token pair of an instance (dict) that leads to
+    highest objective.
+
+    Returns the solution orders and prices, and the fee.
+    """
+    if start_time is None:
+        start_time = time.time()
+
+    time_limit = args.time_limit if hasattr(args, 'time_limit') else None
+    deadline = Deadline(time_limit, start_time)
+
+    # Load problem.
+    accounts, orders, fee = load_problem(instance)
+
+    # Index orders by (buy_token, sell_token).
+    order_index = index_orders_by_token_pair(orders)
+
+    token_pairs = list(eligible_token_pairs(order_index, fee))
+
+    # Estimate the value (objective upper bound) and cost of every token pair.
+    # Token pairs that can not improve the best objective found so far are
+    # skipped.
+    objective_ubs = {
+        token_pair: compute_token_pair_objective_upper_bound(
+            token_pair, order_index, fee
+        )
+        for token_pair in token_pairs
+    }
+    costs = {
+        token_pair: compute_token_pair_cost(token_pair, order_index, fee)
+        for token_pair in token_pairs
+    }
+
+    best_objective = 0
+    best_solution = TRIVIAL_SOLUTION
+
+    # Resume from the token pairs fully evaluated in previous runs, if any.
+    ledger_filename = args.ledger if hasattr(args, 'ledger') else None
+    if ledger_filename is not None:
+        instance_hash = compute_instance_hash(instance)
+        token_pair_keys = {
+            token_pair: compute_token_pair_key(
+                token_pair,
+                select_token_pair_order_list(token_pair, order_index, fee),
+                accounts, fee
+            )
+            for token_pair in token_pairs
+        }
+        ledger_entries = load_ledger(ledger_filename)
+        completed_token_pairs = [
+            token_pair for token_pair in token_pairs
+            if token_pair_keys[token_pair] in ledger_entries
+        ]
+        for token_pair in completed_token_pairs:
+            objective, solution = restore_token_pair(
+                ledger_entries[token_pair_keys[token_pair]],
+                select_token_pair_order_list(token_pair, order_index, fee)
+            )
+            if objective > best_objective:
+                best_objective, best_solution = objective, solution
+        logger.info(
+            "Resuming from %s token pairs in ledger (%s remaining).",
+            len(completed_token_pairs), len(token_pairs) - len(completed_token_pairs)
+        )
+        completed_token_pairs = set(completed_token_pairs)
+        token_pairs = [
+            token_pair for token_pair in token_pairs
+            if token_pair not in completed_token_pairs
+        ]
+
+    # Schedule the remaining token pairs so as to reach the best objective
+    # possible within the time limit, i.e. the time left for all workers.
+    nr_workers = args.workers if hasattr(args, 'workers') else 1
+    time_budget = deadline.remaining()
+    if time_budget is not None:
+        time_budget *= nr_workers
+    token_pairs = schedule_token_pairs(token_pairs, objective_ubs, costs, time_budget)
+
+    # In checkpoint mode, the solution file is (atomically) rewritten every time
+    # the best solution improves, starting with the initial one, so that a valid
+    # solution is available even if the process is killed.
+    checkpoint = args.checkpoint if hasattr(args, 'checkpoint') else False
+    checkpoint_objective = best_objective
+
+    def dump_checkpoint(solution):
+        orders, prices = solution
+        runtime = time.time() - start_time
+        stats = Stats(runtime=runtime, exit_status="checkpoint")
+        # The (temporary) solution file created by the first checkpoint, if
+        # no solution file was given, is reused.
+        args.solution_filename = dump_solution(
+            deepcopy(instance), args.solution_filename,
+            orders,
+            prices,
+            fee=fee,
+            stats=stats,
+            arith_traits=IntegerTraits
+        )
+
+    if checkpoint:
+        dump_checkpoint(best_solution)
+
+    results_file = args.token_pair_results \
+        if hasattr(args, 'token_pair_results') else None
+
+    def on_token_pair_solved(token_pair, objective, solution, runtime):
+        nonlocal checkpoint_objective
+        log_token_pair_cost(token_pair, costs[token_pair], runtime)
+
+        if results_file is not None:
+            write_token_pair_result(results_file, token_pair, objective, runtime)
+
+        if checkpoint and objective > checkpoint_objective:
+            checkpoint_objective = objective
+            dump_checkpoint(solution)
+
+        # Only record token pairs that were not interrupted by the deadline.
+        if ledger_filename is not None and not deadline.is_expired():
+            record_token_pair(
+                ledger_filename, instance_hash, token_pair_keys[token_pair],
+                token_pair, objective, solution,
+                select_token_pair_order_list(token_pair, order_index, fee)
+            )
+
+    # Find token pair + fee token matching.
+    if nr_workers > 1:
+        best_objective, best_solution = solve_token_pairs_in_parallel(
+            token_pairs, objective_ubs, accounts, order_index, fee, deadline,
+            on_token_pair_solved, nr_workers,
+            best_objective=best_objective, best_solution=best_solution
+        )
+    else:
+        best_objective, best_solution = solve_token_pairs_sequentially(
+            token_pairs, objective_ubs, accounts, order_index, fee, deadline,
+            on_token_pair_solved,
+            best_objective=best_objective, best_solution=best_solution
+        )
+
     orders, prices = best_solution
 
+    return orders, prices, fee
+
+
+def main(args):
+    start_time = time.time()
+
+    # Load dict from json.
+    instance = json.load(args.instance, parse_float=D)
+
+    orders, prices, fee = solve_instance(instance, args, start_time)
+
     runtime = time.time() - start_time
     stats = Stats(runtime=runtime, exit_status="completed")
 
@@ -150,4 +477,33 @@ def setup_arg_parser(subparsers):
         help="Matches orders on the token pair that leads to higher objective."
     )
 
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Number of worker processes evaluating token pairs in parallel."
+    )
+
+    parser.add_argument(
+        '--ledger',
+        type=str,
+        default=None,
+        help="File recording the token pairs fully evaluated in previous runs, "
+        "which are then skipped (created if it does not exist)."
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        action='store_true',
+        help="Rewrite the solution file every time the best solution improves."
+    )
+
+    parser.add_argument(
+        '--token-pair-results',
+        type=argparse.FileType('w'),
+        default=None,
+        help="File where the objective and runtime of every token pair solved "
+        "is streamed to, as json lines ('-' for stdout)."
+    )
+
     parser.set_defaults(exec_subcommand=main)
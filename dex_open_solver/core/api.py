@@ -1,5 +1,6 @@
 import json
 import logging
+import os
 import sys
 import tempfile
 from collections import namedtuple
@@ -39,15 +40,18 @@ def load_problem(instance):
     return accounts, orders, fee
 
 
-def dump_solution(
+def format_solution(
     instance,
-    solution_filename,
     orders,
     prices,
     fee,
     stats,
     arith_traits=IntegerTraits
 ):
+    """Add a solution to an instance, returning the solution json (dict).
+
+    Note that the instance (dict) is also updated.
+    """
     # Dump prices.
     instance['prices'] = prices
 
@@ -88,15 +92,45 @@ def dump_solution(
     solver['exit_status'] = stats.exit_status
     instance['solver'] = solver
 
-    # Dump json.
+    return instance
+
+
+def write_solution(solution, solution_filename):
+    """Write a solution json (dict) to a file, returning the filename.
+
+    If no filename is given, the solution is written to a temporary file.
+    """
     if solution_filename is None:
         solution_file = tempfile.NamedTemporaryFile(
             mode='w+', delete=False, prefix='solution-', suffix='.json'
         )
         solution_filename = solution_file.name
+        json.dump(solution, solution_file, indent=4)
+        solution_file.close()
     else:
-        solution_file = open(solution_filename, "w+")
-    json.dump(instance, solution_file, indent=4)
-    solution_file.close()
+        # Write to a temporary file and then rename it, so that the solution file
+        # is never left partially written (e.g. if the process is killed).
+        tmp_solution_filename = solution_filename + '.tmp'
+        with open(tmp_solution_filename, "w+") as solution_file:
+            json.dump(solution, solution_file, indent=4)
+        os.replace(tmp_solution_filename, solution_filename)
 
     logger.info("Solution file is '%s'.", solution_filename)
+
+    return solution_filename
+
+
+def dump_solution(
+    instance,
+    solution_filename,
+    orders,
+    prices,
+    fee,
+    stats,
+    arith_traits=IntegerTraits
+):
+    """Add a solution to an instance and write it to a file (see format_solution
+    and write_solution).
+    """
+    solution = format_solution(instance, orders, prices, fee, stats, arith_traits)
+    return write_solution(solution, solution_filename)
@@ -42,9 +42,59 @@ class Config:
     # TODO: Monitor constant and eventually improve.
     PRICE_ESTIMATION_ERROR = 10
 
+    # Arithmetic parameters:
+
+    # If true, the objective of the solutions for each number of executed f_orders
+    # is computed in fixed point (rather than rational) arithmetic, which is faster
+    # but may select a slightly suboptimal solution. Amounts are still computed
+    # exactly, and the final solution is validated exactly.
+    FIXED_POINT_OBJECTIVE = False
+
+    # If set, candidate xrates computed when searching for the optimal xrate are
+    # snapped to the closest xrate with at most this denominator. Since prices
+    # are integers (of the order of FEE_TOKEN_PRICE), FEE_TOKEN_PRICE is a
+    # natural choice. Keeps the rational arithmetic cheap, but may select a
+    # slightly suboptimal xrate.
+    XRATE_MAX_DENOMINATOR = None
+
+    # Search parameters:
+
+    # If true, the objective of candidate xrates is first approximated in floating
+    # point arithmetic, and only computed exactly for the candidates that may be
+    # optimal according to the approximation. Does not change the selected xrate.
+    XRATE_SEARCH_SCREENING = False
+
+    # If true, the number of executed f_orders is found by trying all of them
+    # in increasing order, rather than by golden-section search. Slower, but
+    # does not rely on the objective having a single optimum in the number of
+    # executed f_orders (useful to verify the faster search).
+    LINEAR_F_ORDERS_SEARCH = False
+
+    # If true, the orders that make a solution economically inviable are removed
+    # at once, bisecting on their number, rather than one at a time. Faster, but
+    # may remove more orders than needed.
+    ECONOMIC_VIABILITY_BATCH_REMOVAL = False
+
     # Convenience method to compute effective min tradable amount.
     @classproperty
     def MIN_RATIONAL_TRADABLE_AMOUNT(self):
         return int(
             self.MIN_TRADABLE_AMOUNT * (1 + self.MIN_TRADABLE_AMOUNT_ROUNDING_TOL)
         )
+
+
+def get_config_parameters():
+    """Return the current (runtime) values of all Config parameters.
+
+    Useful for replicating the configuration in worker processes.
+    """
+    return {
+        name: value for name, value in vars(Config).items()
+        if name.isupper() and not isinstance(value, property)
+    }
+
+
+def set_config_parameters(parameters):
+    """Set Config parameters from a dict returned by `get_config_parameters`."""
+    for name, value in parameters.items():
+        setattr(Config, name, value)
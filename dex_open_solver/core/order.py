@@ -7,7 +7,25 @@ from .config import Config
 
 
 class Order(object):
-    """Class representing an Order."""
+    """Class representing an Order.
+
+    Orders are created and copied in large numbers by the solvers, hence the
+    attributes are stored in slots rather than in a per-instance dict.
+    """
+    __slots__ = (
+        '_id',
+        '_account_id',
+        '_buy_token',
+        '_sell_token',
+        '_max_sell_amount',
+        '_original_max_sell_amount',
+        '_max_xrate',
+        '_buy_amount',
+        '_sell_amount',
+        '_utility',
+        '_utility_disreg'
+    )
+
     def __init__(
         self,
         buy_token,
@@ -147,22 +165,29 @@ class Order(object):
         return self.__str__()
 
     def get_sell_amount_from_buy_amount(
-        self, prices, fee, arith_traits
+        self, prices, fee, arith_traits, buy_amount=None
     ):
-        """Compute the execSellAmount from execBuyAmount of this order."""
-        buy_token_price = prices[self.buy_token]
-        sell_token_price = prices[self.sell_token]
+        """Compute the execSellAmount from execBuyAmount of this order.
+
+        If buy_amount is given, it is used instead of execBuyAmount, i.e. the
+        result is the execSellAmount of the order at that buy amount (without
+        creating a copy of the order with that buy amount).
+        """
+        if buy_amount is None:
+            buy_amount = self._buy_amount
+        buy_token_price = prices[self._buy_token]
+        sell_token_price = prices[self._sell_token]
 
         if buy_token_price and sell_token_price:
             xrate = F(buy_token_price, sell_token_price)
             return arith_traits.compute_sell_from_buy_amount(
-                buy_amount=self.buy_amount,
+                buy_amount=buy_amount,
                 xrate=xrate,
                 buy_token_price=buy_token_price,
                 fee=fee
             )
         else:
-            assert self.buy_amount == 0
+            assert buy_amount == 0
             return 0
 
     def set_sell_amount_from_buy_amount(self, *args, **kwargs):
@@ -171,7 +196,7 @@ class Order(object):
 
     def volume(self, prices):
         """Compute order volume."""
-        return self.buy_amount * prices[self.buy_token]
+        return self._buy_amount * prices[self._buy_token]
 
     def fee(self, prices, fee):
         """Compute order fees, in fee tokens."""
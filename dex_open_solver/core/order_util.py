@@ -43,25 +43,102 @@ class RationalTraits(BaseTraits):
         return max(
             0,
             cls.compute_utility_term(
-                order=order.with_buy_amount(min_buy_amount),
+                order=order,
                 xrate=xrate,
                 buy_token_price=buy_token_price,
-                fee=fee
+                fee=fee,
+                buy_amount=min_buy_amount
             )
         )
 
     @classmethod
-    def compute_utility_term(cls, order, xrate, buy_token_price, fee):
+    def compute_utility_term(cls, order, xrate, buy_token_price, fee, buy_amount=None):
+        """Compute the utility of the order at the given buy amount.
+
+        If buy_amount is None, order.buy_amount is used.
+        """
+        if buy_amount is None:
+            buy_amount = order.buy_amount
         sell_amount = cls.compute_sell_from_buy_amount(
-            buy_amount=order.buy_amount,
+            buy_amount=buy_amount,
             xrate=xrate,
             buy_token_price=buy_token_price,
             fee=fee
         )
-        u = buy_token_price * (order.buy_amount - sell_amount / order.max_xrate)
+        u = buy_token_price * (buy_amount - sell_amount / order.max_xrate)
         return u
 
 
+class FixedPointTraits(BaseTraits):
+    """Order utility functions based on fixed point arithmetic.
+
+    Same semantics as RationalTraits, but each result is computed from the
+    numerators and denominators of the arguments with integer arithmetic, and
+    then rounded to a multiple of 1 / DENOMINATOR. This avoids the gcd
+    normalization of every intermediate rational operation.
+
+    Rounding is conservative: utilities and sell amounts are rounded down and
+    max utilities are rounded up, so that objective terms never exceed the
+    ones computed with RationalTraits.
+    """
+    DENOMINATOR = 10**18
+
+    @classmethod
+    def round_down(cls, numerator, denominator):
+        return F((numerator * cls.DENOMINATOR) // denominator, cls.DENOMINATOR)
+
+    @classmethod
+    def round_up(cls, numerator, denominator):
+        return F(-((-numerator * cls.DENOMINATOR) // denominator), cls.DENOMINATOR)
+
+    # Return (1 - fee) as a (numerator, denominator) pair.
+    @staticmethod
+    def fee_factor(fee):
+        return fee.value.denominator - fee.value.numerator, fee.value.denominator
+
+    # xrate is in [sell_token] / [buy_token] units
+    @classmethod
+    def compute_sell_from_buy_amount(cls, buy_amount, xrate, fee, **kwargs):
+        # buy_amount * xrate / (1 - fee)
+        fn, fd = cls.fee_factor(fee)
+        return cls.round_down(
+            buy_amount.numerator * xrate.numerator * fd,
+            buy_amount.denominator * xrate.denominator * fn
+        )
+
+    @classmethod
+    def compute_max_utility_term(cls, order, xrate, buy_token_price, fee, **kwargs):
+        # Utility at min_buy_amount = max_sell_amount / xrate * (1 - fee), i.e.
+        # buy_token_price * max_sell_amount * ((1 - fee) / xrate - 1 / max_xrate).
+        fn, fd = cls.fee_factor(fee)
+        xn, xd = xrate.numerator, xrate.denominator
+        mn, md = order.max_xrate.numerator, order.max_xrate.denominator
+        y = order.max_sell_amount
+        umax = cls.round_up(
+            buy_token_price.numerator * y.numerator * (xd * fn * mn - xn * fd * md),
+            buy_token_price.denominator * y.denominator * xn * fd * mn
+        )
+        return max(0, umax)
+
+    @classmethod
+    def compute_utility_term(cls, order, xrate, buy_token_price, fee, buy_amount=None):
+        """Compute the utility of the order at the given buy amount.
+
+        If buy_amount is None, order.buy_amount is used.
+        """
+        if buy_amount is None:
+            buy_amount = order.buy_amount
+        # buy_token_price * buy_amount * (1 - xrate / ((1 - fee) * max_xrate))
+        fn, fd = cls.fee_factor(fee)
+        xn, xd = xrate.numerator, xrate.denominator
+        mn, md = order.max_xrate.numerator, order.max_xrate.denominator
+        return cls.round_down(
+            buy_token_price.numerator * buy_amount.numerator
+            * (xd * fn * mn - xn * fd * md),
+            buy_token_price.denominator * buy_amount.denominator * xd * fn * mn
+        )
+
+
 class StandardSolverIntegerTraits(BaseTraits):
     """Order utility functions based on integer arithmeric.
 
@@ -105,10 +182,11 @@ class StandardSolverIntegerTraits(BaseTraits):
 
     @classmethod
     def compute_utility_term(
-        cls, order, xrate, buy_token_price, fee
+        cls, order, xrate, buy_token_price, fee, buy_amount=None
     ):
         min_buy_amount = order.max_sell_amount / order.max_xrate
-        buy_amount = order.buy_amount
+        if buy_amount is None:
+            buy_amount = order.buy_amount
         max_sell_amount = order.max_sell_amount
         sell_amount = cls.compute_sell_from_buy_amount(
             buy_amount=buy_amount,
@@ -177,12 +255,13 @@ class SmartContractTraits(BaseTraits):
 
     @classmethod
     def compute_utility_term(
-        cls, order, xrate, buy_token_price, fee
+        cls, order, xrate, buy_token_price, fee, buy_amount=None
     ):
         max_sell_amount = order.original_max_sell_amount
         min_buy_amount = max_sell_amount / order.max_xrate
         assert min_buy_amount.denominator == 1
-        buy_amount = order.buy_amount
+        if buy_amount is None:
+            buy_amount = order.buy_amount
 
         sell_amount = cls.compute_sell_from_buy_amount(
             buy_amount=buy_amount,
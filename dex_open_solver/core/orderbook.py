@@ -1,4 +1,6 @@
 import logging
+from collections import defaultdict
+from copy import copy
 from fractions import Fraction as F
 from functools import cmp_to_key
 from typing import Dict, List, Tuple
@@ -115,6 +117,45 @@ def filter_orders_tokenpair(
     ]
 
 
+def index_orders_by_token_pair(
+    orders: List[Order]
+) -> Dict[Tuple[str, str], List[Order]]:
+    """Group orders by directed token pair, in a single pass.
+
+    Args:
+        orders: List of orders.
+
+    Returns:
+        Dict of (buy_token, sell_token) -> list of orders buying buy_token
+        and selling sell_token, in the same relative order as in `orders`.
+
+    """
+    order_index = defaultdict(list)
+    for order in orders:
+        order_index[order.buy_token, order.sell_token].append(order)
+    return dict(order_index)
+
+
+def compute_best_limit_xrates(
+    order_index: Dict[Tuple[str, str], List[Order]]
+) -> Dict[Tuple[str, str], F]:
+    """Summarize an order index by the best limit xrate of each directed token pair.
+
+    Args:
+        order_index: Dict of (buy_token, sell_token) -> orders, as returned by
+            index_orders_by_token_pair.
+
+    Returns:
+        Dict of (buy_token, sell_token) -> maximum max_xrate over the orders
+        buying buy_token and selling sell_token.
+
+    """
+    return {
+        token_pair: max(order.max_xrate for order in orders)
+        for token_pair, orders in order_index.items()
+    }
+
+
 def restrict_order_sell_amounts_by_balances(
     orders: List[Order],
     accounts: Dict[str, Dict[str, int]]
@@ -216,6 +257,41 @@ def compute_objective(prices, accounts_updated, orders, fee):
     return 2 * total_u - total_umax
 
 
+def snapshot_execution(orders):
+    """Return the execution of the orders, i.e. the list of their (buy_amount,
+    sell_amount), by position.
+
+    Much cheaper than copying the orders, when only their execution changes.
+    """
+    return [(order.buy_amount, order.sell_amount) for order in orders]
+
+
+def restore_execution(orders, execution):
+    """Set the buy and sell amounts of the orders from an execution returned by
+    snapshot_execution (for the same orders)."""
+    assert len(orders) == len(execution)
+    for order, (buy_amount, sell_amount) in zip(orders, execution):
+        order.buy_amount = buy_amount
+        order.sell_amount = sell_amount
+
+
+def snapshot_solution(solution):
+    """Return a copy of the solution (orders, prices) that is not affected by
+    later executions of its orders.
+
+    The orders are copied shallowly: all their attributes are immutable values.
+    """
+    orders, prices = solution
+    return [copy(order) for order in orders], dict(prices)
+
+
+def copy_accounts(accounts):
+    """Return a copy of the accounts (token balances are immutable values)."""
+    return {
+        account_id: dict(balances) for account_id, balances in accounts.items()
+    }
+
+
 # Update accounts from order execution.
 def update_accounts(accounts, orders):
     for order in orders:
@@ -332,11 +408,14 @@ def compute_approx_economic_viable_subset(orders, prices, fee, arith_traits):
         reverse=True
     )
 
+    # Find the first prefix with average fee below the minimum, keeping the
+    # total fee of the current prefix (all its orders are executed).
     i = 1
-    while i < len(orders_by_dec_volume) and \
-        compute_average_order_fee(
-        orders_by_dec_volume[:i], prices, fee, arith_traits
-    ) >= Config.MIN_AVERAGE_ORDER_FEE:
+    total_fee = 0
+    for o in orders_by_dec_volume[:-1]:
+        total_fee += o.fee(prices, fee)
+        if total_fee / i < Config.MIN_AVERAGE_ORDER_FEE:
+            break
         i += 1
 
     orders = orders_by_dec_volume[:i]
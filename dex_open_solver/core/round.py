@@ -143,8 +143,10 @@ def round_leaf_token(leaf_token, parent_token, orders, token_balances, prices, f
             token_balances[leaf_token]
         )
 
-        new_sell_amount = order.with_buy_amount(order.buy_amount + buy_amount_delta)\
-            .get_sell_amount_from_buy_amount(prices, fee, IntegerTraits)
+        new_sell_amount = order.get_sell_amount_from_buy_amount(
+            prices, fee, IntegerTraits,
+            buy_amount=order.buy_amount + buy_amount_delta
+        )
 
         # Skip order if rounding would lead to violation of max sell amount.
         if new_sell_amount > order.max_sell_amount:
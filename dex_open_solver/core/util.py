@@ -1,5 +1,6 @@
 from fractions import Fraction as F
 import logging
+import time
 
 
 def transform(obj, transformer):
@@ -65,3 +66,30 @@ class LoggerFormatter(logging.Formatter):
 class classproperty(property):
     def __get__(self, cls, owner):
         return classmethod(self.fget).__get__(None, owner)()
+
+
+class Deadline:
+    """A point in (wall clock) time after which solving should stop.
+
+    Long running loops check the deadline and, when expired, stop cleanly
+    keeping the best solution found so far. Deadlines can be sent to other
+    processes in the same host.
+    """
+    def __init__(self, time_limit=None, start_time=None):
+        if start_time is None:
+            start_time = time.time()
+        self.time = None if time_limit is None else start_time + time_limit
+
+    def is_expired(self):
+        return self.time is not None and time.time() > self.time
+
+    def remaining(self):
+        """Return the remaining time in seconds, or None if there is no deadline."""
+        if self.time is None:
+            return None
+        return max(self.time - time.time(), 0)
+
+
+def is_expired(deadline):
+    """Check if an optional deadline is expired."""
+    return deadline is not None and deadline.is_expired()
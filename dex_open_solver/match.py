@@ -1,33 +1,30 @@
 import argparse
 import logging
+import sys
 from fractions import Fraction as F
 
+from .batch import setup_arg_parser as setup_batch_parser
 from .best_token_pair_solver.solver import \
     setup_arg_parser as setup_best_token_pair_parser
 from .core.util import LoggerFormatter
+from .serve import setup_arg_parser as setup_serve_parser
 from .token_pair_solver.solver import \
     setup_arg_parser as setup_token_pair_solver_parser
 from .core.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Subcommands that do not solve a single instance file, and hence are used as
+# `gp_match <subcommand> [options]`, e.g. `gp_match serve`.
+STANDALONE_SUBCOMMANDS = {
+    'serve': (setup_serve_parser, "Serve solving requests over HTTP."),
+    'batch': (setup_batch_parser, "Solve many instances.")
+}
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Match orders in an orderbook."
-    )
-    parser.add_argument(
-        'instance',
-        type=argparse.FileType('r'),
-        help="File containing the instance to solve."
-    )
-    parser.add_argument(
-        '--solution',
-        type=str,
-        default=None,
-        help="File where the solution should be output to. "
-             "(by default creates a file in a temp directory)"
-    )
+
+def setup_common_arg_parser():
+    """Options common to all subcommands."""
+    parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument(
         '--logging',
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
@@ -54,6 +51,37 @@ def main():
         help="Minimum absolute fee payed per order (not selling the "
         "fee token) on an admissible solution."
     )
+    parser.add_argument(
+        '--fixed-point-objective',
+        action='store_true',
+        help="Compare solutions using an objective computed in fixed point "
+        "arithmetic (faster, but possibly slightly suboptimal)."
+    )
+    parser.add_argument(
+        '--xrate-max-denominator',
+        default=None,
+        type=int,
+        help="Snap candidate xrates to the closest xrate with at most this "
+        "denominator (faster, but possibly slightly suboptimal)."
+    )
+    parser.add_argument(
+        '--xrate-search-screening',
+        action='store_true',
+        help="Screen candidate xrates with a floating point approximation of the "
+        "objective before computing it exactly."
+    )
+    parser.add_argument(
+        '--linear-f-orders-search',
+        action='store_true',
+        help="Try all numbers of executed orders selling the fee token, rather "
+        "than searching for the best one (slower, useful for verification)."
+    )
+    parser.add_argument(
+        '--economic-viability-batch-removal',
+        action='store_true',
+        help="Remove the orders that make a solution economically inviable at once, "
+        "rather than one at a time (faster, but may remove more orders than needed)."
+    )
 
     parser.add_argument(
         '--time-limit',
@@ -62,6 +90,38 @@ def main():
         help="Maximum time for solving, in seconds."
     )
 
+    return parser
+
+
+def setup_standalone_arg_parser(subcommand, common_parser):
+    setup_parser, description = STANDALONE_SUBCOMMANDS[subcommand]
+    parser = argparse.ArgumentParser(
+        prog=f'gp_match {subcommand}',
+        description=description,
+        parents=[common_parser]
+    )
+    setup_parser(parser)
+    return parser
+
+
+def setup_instance_arg_parser(common_parser):
+    parser = argparse.ArgumentParser(
+        description="Match orders in an orderbook.",
+        parents=[common_parser]
+    )
+    parser.add_argument(
+        'instance',
+        type=argparse.FileType('r'),
+        help="File containing the instance to solve."
+    )
+    parser.add_argument(
+        '--solution',
+        type=str,
+        default=None,
+        help="File where the solution should be output to. "
+             "(by default creates a file in a temp directory)"
+    )
+
     subparsers = parser.add_subparsers(
         title='subcommand',
         description="valid subcommands",
@@ -72,16 +132,33 @@ def main():
 
     setup_best_token_pair_parser(subparsers)
 
-    args = parser.parse_args()
-    log_level = getattr(logging, args.logging)
+    return parser
+
+
+def main():
+    argv = sys.argv[1:]
+    common_parser = setup_common_arg_parser()
 
-    args.solution_filename = args.solution
+    if len(argv) > 0 and argv[0] in STANDALONE_SUBCOMMANDS:
+        parser = setup_standalone_arg_parser(argv[0], common_parser)
+        args = parser.parse_args(argv[1:])
+    else:
+        parser = setup_instance_arg_parser(common_parser)
+        args = parser.parse_args(argv)
+        args.solution_filename = args.solution
+
+    log_level = getattr(logging, args.logging)
 
     Config.MIN_AVERAGE_ORDER_FEE = args.min_avg_fee_per_order
     if args.min_abs_fee_per_order is None:
         Config.MIN_ABSOLUTE_ORDER_FEE = Config.MIN_AVERAGE_ORDER_FEE
     else:
         Config.MIN_ABSOLUTE_ORDER_FEE = args.min_abs_fee_per_order
+    Config.FIXED_POINT_OBJECTIVE = args.fixed_point_objective
+    Config.XRATE_MAX_DENOMINATOR = args.xrate_max_denominator
+    Config.XRATE_SEARCH_SCREENING = args.xrate_search_screening
+    Config.LINEAR_F_ORDERS_SEARCH = args.linear_f_orders_search
+    Config.ECONOMIC_VIABILITY_BATCH_REMOVAL = args.economic_viability_batch_removal
 
     handler = logging.StreamHandler()
     formatter = LoggerFormatter(style='{', rationals=args.log_rationals)
@@ -0,0 +1,328 @@
+"""Long running solver service.
+
+Keeps the solver resident in a pool of worker processes, and solves instances
+sent over HTTP, on a TCP or Unix socket:
+
+POST /solve?strategy=best-token-pair&time_limit=<seconds>&token_pair=<T1>,<T2>
+
+with the instance json as the request body (all query parameters are optional,
+and token_pair is only used by the token-pair strategy). The response body is
+the solution json.
+
+At most `workers` instances are solved concurrently, and at most
+`max_queue_size` further requests wait for a worker: requests beyond that are
+rejected with 503 (Service Unavailable). A request counts towards these limits
+until its worker finishes, even if the request timed out. The time limit of a
+request (a positive number of seconds, otherwise the request is rejected with
+400 (Bad Request)) is at most the time limit of the service, if any. Requests that are not
+solved within their time limit (plus TIME_LIMIT_TOLERANCE) get a 504 (Gateway
+Timeout). Request bodies larger than `max_body_size` bytes are rejected with
+413 (Payload Too Large).
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal as D
+from http import HTTPStatus
+from math import isfinite
+from urllib.parse import parse_qs, urlsplit
+
+from .core.config import get_config_parameters, set_config_parameters
+from .core.util import LoggerFormatter
+from .strategies import STRATEGIES, solve_instance
+
+logger = logging.getLogger(__name__)
+
+# Time (in seconds) given to the solver, after the time limit of a request,
+# to round and return the best solution found.
+TIME_LIMIT_TOLERANCE = 5
+
+# Default maximum size (in bytes) of a request body.
+MAX_BODY_SIZE = 64 * 2**20
+
+
+class BadRequest(Exception):
+    status = HTTPStatus.BAD_REQUEST
+
+
+class PayloadTooLarge(BadRequest):
+    status = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+def init_worker(config_parameters, log_level):
+    """Replicate the configuration of the service in a worker process."""
+    set_config_parameters(config_parameters)
+    handler = logging.StreamHandler()
+    handler.setFormatter(LoggerFormatter(style='{'))
+    logging.basicConfig(level=log_level, style='{', handlers=[handler])
+
+
+def solve_request(instance_json, strategy, token_pair, time_limit):
+    """Solve an instance json (string), returning the solution json (string).
+
+    Runs in the worker processes.
+    """
+    start_time = time.time()
+    try:
+        instance = json.loads(instance_json, parse_float=D)
+    except json.JSONDecodeError as error:
+        raise BadRequest(f"Invalid instance: {error}")
+    args = Namespace(token_pair=token_pair, xrate=None, time_limit=time_limit)
+    solution = solve_instance(instance, strategy, args, start_time)
+    return json.dumps(solution)
+
+
+def parse_solve_query(query, max_time_limit):
+    """Parse the query parameters of a solve request.
+
+    Returns the strategy, token pair and time limit of the request.
+    """
+    query = parse_qs(query)
+
+    strategy = query.get('strategy', ['best-token-pair'])[0]
+    if strategy not in STRATEGIES:
+        raise BadRequest(f"Unknown strategy '{strategy}'.")
+
+    token_pair = None
+    if 'token_pair' in query:
+        token_pair = query['token_pair'][0].split(',')
+        if len(token_pair) != 2:
+            raise BadRequest("token_pair must be two comma separated tokens.")
+    elif strategy == 'token-pair':
+        raise BadRequest("The token-pair strategy requires a token_pair.")
+
+    time_limit = max_time_limit
+    if 'time_limit' in query:
+        try:
+            time_limit = float(query['time_limit'][0])
+        except ValueError:
+            raise BadRequest("time_limit must be a number.")
+        if not isfinite(time_limit) or time_limit <= 0:
+            raise BadRequest("time_limit must be a positive number of seconds.")
+        if max_time_limit is not None:
+            time_limit = min(time_limit, max_time_limit)
+
+    return strategy, token_pair, time_limit
+
+
+async def read_request(reader, writer, max_body_size=MAX_BODY_SIZE):
+    """Read an HTTP request, returning its method, target and body."""
+    request_line = (await reader.readline()).decode('latin-1').split()
+    if len(request_line) != 3:
+        raise BadRequest("Invalid request line.")
+    method, target, _ = request_line
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        content_length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise BadRequest("Invalid Content-Length.")
+    if content_length > max_body_size:
+        raise PayloadTooLarge(f"Request body is larger than {max_body_size} bytes.")
+
+    # Clients that wait for the go-ahead before sending the body (e.g. curl, for
+    # large bodies) would otherwise stall until they time out and send it anyway.
+    if headers.get('expect', '').lower() == '100-continue' and content_length > 0:
+        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        await writer.drain()
+    body = await reader.readexactly(content_length)
+
+    return method, target, body
+
+
+def write_response(writer, status, body):
+    """Write an HTTP response (and close the connection)."""
+    writer.write(
+        f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+        f'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'Connection: close\r\n'
+        f'\r\n'.encode('latin-1') + body
+    )
+
+
+def error_body(message):
+    return json.dumps({'error': message}).encode()
+
+
+class SolverService:
+    """Solves instances received over HTTP in a pool of worker processes.
+
+    Must be created within a running event loop.
+    """
+    def __init__(
+        self, nr_workers=1, max_queue_size=0, max_time_limit=None,
+        max_body_size=MAX_BODY_SIZE
+    ):
+        # Worker processes are spawned (rather than forked) so that they don't
+        # inherit the sockets of open connections, which would then not be closed.
+        self.executor = ProcessPoolExecutor(
+            nr_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(get_config_parameters(), logging.getLogger().level)
+        )
+        self.max_time_limit = max_time_limit
+        self.max_body_size = max_body_size
+        self.max_nr_requests = nr_workers + max_queue_size
+        self.nr_requests = 0
+        self.workers = asyncio.Semaphore(nr_workers)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            status, body = await self.handle_request(reader, writer)
+        except BadRequest as error:
+            status, body = error.status, error_body(str(error))
+        except Exception as error:
+            logger.exception("Error handling request.")
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, error_body(repr(error))
+        write_response(writer, status, body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer):
+        method, target, request_body = await read_request(
+            reader, writer, self.max_body_size
+        )
+        url = urlsplit(target)
+
+        if url.path == '/health' and method == 'GET':
+            return HTTPStatus.OK, json.dumps({'nr_requests': self.nr_requests}).encode()
+
+        if url.path != '/solve':
+            return HTTPStatus.NOT_FOUND, error_body(f"Unknown path '{url.path}'.")
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, error_body("Use POST.")
+
+        strategy, token_pair, time_limit = parse_solve_query(
+            url.query, self.max_time_limit
+        )
+
+        if self.nr_requests >= self.max_nr_requests:
+            return HTTPStatus.SERVICE_UNAVAILABLE, error_body("Request queue is full.")
+
+        solution = await self.solve(
+            request_body.decode(), strategy, token_pair, time_limit
+        )
+        if solution is None:
+            return HTTPStatus.GATEWAY_TIMEOUT, error_body("Time limit exceeded.")
+        return HTTPStatus.OK, solution.encode()
+
+    def finish_request(self):
+        self.nr_requests -= 1
+        self.workers.release()
+
+    async def solve(self, instance_json, strategy, token_pair, time_limit):
+        """Solve an instance json in a worker process, once one is available.
+
+        Returns the solution json, or None if it is not found in time.
+        """
+        self.nr_requests += 1
+        try:
+            await self.workers.acquire()
+        except BaseException:
+            self.nr_requests -= 1
+            raise
+        start_time = time.time()
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, solve_request, instance_json, strategy, token_pair, time_limit
+        )
+        # The worker only becomes available (and the request stops counting
+        # towards max_nr_requests) when it finishes, which may be after the request
+        # times out.
+        future.add_done_callback(lambda _: self.finish_request())
+
+        timeout = None if time_limit is None else time_limit + TIME_LIMIT_TOLERANCE
+        try:
+            solution = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Request timed out (%s).", strategy)
+            return None
+
+        logger.info("Solved request (%s) in %.3fs.", strategy, time.time() - start_time)
+        return solution
+
+
+async def serve(args):
+    service = SolverService(
+        nr_workers=args.workers,
+        max_queue_size=args.max_queue_size,
+        max_time_limit=args.time_limit,
+        max_body_size=args.max_body_size
+    )
+    try:
+        if args.unix_socket is not None:
+            server = await asyncio.start_unix_server(
+                service.handle_connection, path=args.unix_socket
+            )
+            logger.info("Serving on '%s'.", args.unix_socket)
+        else:
+            server = await asyncio.start_server(
+                service.handle_connection, args.host, args.port
+            )
+            logger.info("Serving on %s:%s.", args.host, args.port)
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+
+
+def main(args):
+    asyncio.run(serve(args))
+
+
+def setup_arg_parser(parser):
+    parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help="Host to listen on."
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8000,
+        help="Port to listen on."
+    )
+    parser.add_argument(
+        '--unix-socket',
+        type=str,
+        default=None,
+        help="Unix socket to listen on (instead of host/port)."
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Number of worker processes, i.e. of instances solved concurrently."
+    )
+    parser.add_argument(
+        '--max-queue-size',
+        type=int,
+        default=16,
+        help="Maximum number of requests waiting for a worker."
+    )
+    parser.add_argument(
+        '--max-body-size',
+        type=int,
+        default=MAX_BODY_SIZE,
+        help="Maximum size (in bytes) of a request body."
+    )
+
+    parser.set_defaults(exec_subcommand=main)
@@ -0,0 +1,29 @@
+"""Solving strategies available for solving instances in memory."""
+import time
+
+from .best_token_pair_solver.solver import \
+    solve_instance as solve_instance_best_token_pair
+from .core.api import Stats, format_solution
+from .token_pair_solver.solver import \
+    solve_instance as solve_instance_token_pair
+
+STRATEGIES = {
+    'token-pair': solve_instance_token_pair,
+    'best-token-pair': solve_instance_best_token_pair
+}
+
+
+def solve_instance(instance, strategy, args, start_time=None):
+    """Solve an instance (dict) with the given strategy.
+
+    Returns the solution json (dict).
+    """
+    if start_time is None:
+        start_time = time.time()
+
+    orders, prices, fee = STRATEGIES[strategy](instance, args, start_time)
+
+    runtime = time.time() - start_time
+    stats = Stats(runtime=runtime, exit_status="completed")
+
+    return format_solution(instance, orders, prices, fee, stats)
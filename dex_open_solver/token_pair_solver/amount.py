@@ -11,9 +11,11 @@ where X is an array of buy amounts.
 See https://github.com/gnosis/dex-open-solver/blob/master/doc/token_pair/token_pair.pdf.
 """
 import logging
+from itertools import islice
 
 from ..core.config import Config
 from ..core.orderbook import sorted_orders_by_exec_priority
+from .orderbook import count_orders_satisfying_xrate
 
 
 logger = logging.getLogger(__name__)
@@ -84,8 +86,20 @@ def s_buy_amount_from_b_buy_amount(b_buy_amount, xrate, fee):
 # definitions of the two functions above.
 
 
-def filter_orders_violating_max_xrate(xrate, b_orders, s_orders, fee):
-    """Remove orders that violate the maximum exchange rate (considering the fee)."""
+def filter_orders_violating_max_xrate(xrate, b_orders, s_orders, fee, presorted=False):
+    """Remove orders that violate the maximum exchange rate (considering the fee).
+
+    If the orders are sorted by execution priority (presorted=True), the remaining
+    orders are prefixes, found by binary search, and therefore remain sorted.
+    """
+    if presorted:
+        b_orders = b_orders[:count_orders_satisfying_xrate(
+            b_orders, xrate, fee, presorted=True
+        )]
+        s_orders = s_orders[:count_orders_satisfying_xrate(
+            s_orders, 1 / xrate, fee, presorted=True
+        )]
+        return b_orders, s_orders
 
     # For b_orders: xrate <= max_xrate * (1 - fee)
     b_orders = [
@@ -102,20 +116,26 @@ def filter_orders_violating_max_xrate(xrate, b_orders, s_orders, fee):
     return b_orders, s_orders
 
 
-def filter_orders_violating_min_tradable_amount(xrate, b_orders, s_orders, fee):
-    """Remove orders which will violate min tradable amount."""
+def filter_orders_violating_min_tradable_amount(
+    xrate, b_orders, s_orders, fee, max_nr_orders=None
+):
+    """Remove orders which will violate min tradable amount.
+
+    If max_nr_orders is given, only the first max_nr_orders remaining orders on
+    each side are returned, and the orders after them are not even checked.
+    """
 
-    b_orders = [
+    b_orders = list(islice((
         order for order in b_orders
         if order.max_sell_amount >= MIN_TRADABLE_AMOUNT
         and b_buy_amount_from_b_max_sell_amount(order, xrate, fee) >= MIN_TRADABLE_AMOUNT
-    ]
+    ), max_nr_orders))
 
-    s_orders = [
+    s_orders = list(islice((
         order for order in s_orders
         if order.max_sell_amount >= MIN_TRADABLE_AMOUNT
         and s_buy_amount_from_s_max_sell_amount(order, xrate, fee) >= MIN_TRADABLE_AMOUNT
-    ]
+    ), max_nr_orders))
 
     return b_orders, s_orders
 
@@ -305,12 +325,15 @@ def undo_order_execution_violating_min_tradable_amount_constraint(
 
 
 def compute_buy_amounts(
-    xrate, b_orders, s_orders, fee, max_nr_exec_orders=None
+    xrate, b_orders, s_orders, fee, max_nr_exec_orders=None, presorted=False
 ):
     """Compute optimal buy amounts for two sets of orders between two tokens.
 
     Convention:
     xrate = p(b_token) / p(s_token) = (s_amount / b_amount) * (1 - fee).
+
+    If b_orders and s_orders are already sorted by execution priority
+    (presorted=True), they are not sorted again.
     """
 
     # NOTE: do not add this as a default parameter above, since
@@ -328,22 +351,26 @@ def compute_buy_amounts(
 
     # Remove orders that violate the maximum exchange rate.
     b_orders, s_orders = filter_orders_violating_max_xrate(
-        xrate, b_orders, s_orders, fee
+        xrate, b_orders, s_orders, fee, presorted
     )
 
+    # Sort orders by optimal execution order (filtering keeps the order).
+    if not presorted:
+        b_orders = sorted_orders_by_exec_priority(b_orders)
+        s_orders = sorted_orders_by_exec_priority(s_orders)
+
     # Remove orders which will violate the min tradable amount.
+    # Since at most max_nr_exec_orders orders can be executed on each side (see
+    # loop below), only the first max_nr_exec_orders remaining orders are kept,
+    # so that the cost of filtering does not depend on the number of orders.
     b_orders, s_orders = filter_orders_violating_min_tradable_amount(
-        xrate, b_orders, s_orders, fee
+        xrate, b_orders, s_orders, fee, max_nr_orders=max_nr_exec_orders
     )
 
     # Early exit: if there are no orders on one of the sides, there's no match.
     if len(b_orders) == 0 or len(s_orders) == 0:
         return
 
-    # Sort orders by optimal execution order.
-    b_orders = sorted_orders_by_exec_priority(b_orders)
-    s_orders = sorted_orders_by_exec_priority(s_orders)
-
     # Execute matching orders, bounded by the max_nr_exec_orders constraint:
     b_i = 0
     s_i = 0
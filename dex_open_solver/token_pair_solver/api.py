@@ -4,7 +4,8 @@ from copy import deepcopy
 
 from ..core.api import load_fee
 from ..core.order import Order
-from ..core.orderbook import restrict_order_sell_amounts_by_balances
+from ..core.orderbook import (index_orders_by_token_pair,
+                              restrict_order_sell_amounts_by_balances)
 
 
 def load_problem(instance, token_pair):
@@ -20,23 +21,16 @@ def load_problem(instance, token_pair):
 
     orders = restrict_order_sell_amounts_by_balances(orders, accounts)
 
-    b_orders = [
-        order for order in orders
-        if order.buy_token == b_buy_token and order.sell_token == s_buy_token
-    ]
-    s_orders = [
-        order for order in orders
-        if order.buy_token == s_buy_token and order.sell_token == b_buy_token
-    ]
+    order_index = index_orders_by_token_pair(orders)
+
+    b_orders = order_index.get((b_buy_token, s_buy_token), [])
+    s_orders = order_index.get((s_buy_token, b_buy_token), [])
 
     fee = load_fee(instance['fee'])
 
     # If one of the tokens in the token pair is the fee token, then it must be b_buy_token
     assert s_buy_token != fee.token
 
-    f_orders = [
-        order for order in orders
-        if order.buy_token == b_buy_token and order.sell_token == fee.token
-    ]
+    f_orders = order_index.get((b_buy_token, fee.token), [])
 
     return accounts, b_orders, s_orders, f_orders, fee
@@ -1,8 +1,160 @@
 """Functions for orderbooks containing 2 tokens (and optionally the fee token)."""
+from bisect import bisect_left, bisect_right
 from fractions import Fraction as F
+from itertools import accumulate
 
 from ..core.config import Config
 from ..core.order_util import IntegerTraits, RationalTraits
+from ..core.orderbook import sorted_orders_by_exec_priority
+
+
+class NegatedKeys:
+    """Read-only sequence of the negated keys of some items, computed on access.
+
+    Allows searching items sorted by decreasing key with bisect, without
+    copying them.
+    """
+    __slots__ = ('items', 'key')
+
+    def __init__(self, items, key=None):
+        self.items = items
+        self.key = key
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        if self.key is None:
+            return -self.items[i]
+        return -self.key(self.items[i])
+
+
+class OrderColumns:
+    """Orders on one side of a token pair, stored as columns.
+
+    Orders are sorted by execution priority (i.e. by decreasing max_xrate), and
+    their max_xrates and max_sell_amounts are kept in arrays in the same order,
+    along with prefix sums of the max_sell_amounts. Therefore:
+
+    - the orders satisfying a given xrate are always a prefix of the orders,
+      found by binary search,
+    - the total max_sell_amount (and min buy amount, i.e. max_sell_amount /
+      max_xrate) of a range of orders is computed in O(1).
+    """
+    __slots__ = (
+        'orders', 'max_xrates', 'max_sell_amounts', 'max_sell_amount_sums',
+        'min_buy_amount_sums', 'max_sell_amount_mins'
+    )
+
+    def __init__(self, orders, presorted=False):
+        if not presorted:
+            orders = sorted_orders_by_exec_priority(orders)
+        self.orders = orders
+        self.max_xrates = [order.max_xrate for order in orders]
+        self.max_sell_amounts = [order.max_sell_amount for order in orders]
+        self.max_sell_amount_sums = [0] + list(accumulate(self.max_sell_amounts))
+        # Computed on demand (see sum_min_buy_amounts and min_max_sell_amount).
+        self.min_buy_amount_sums = None
+        self.max_sell_amount_mins = None
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __iter__(self):
+        return iter(self.orders)
+
+    def __getitem__(self, i):
+        return self.orders[i]
+
+    def head(self, nr_orders):
+        """Columns of the first nr_orders orders (without recomputing them)."""
+        columns = OrderColumns.__new__(OrderColumns)
+        columns.orders = self.orders[:nr_orders]
+        columns.max_xrates = self.max_xrates[:nr_orders]
+        columns.max_sell_amounts = self.max_sell_amounts[:nr_orders]
+        columns.max_sell_amount_sums = self.max_sell_amount_sums[:nr_orders + 1]
+        columns.min_buy_amount_sums = None
+        if self.min_buy_amount_sums is not None:
+            columns.min_buy_amount_sums = self.min_buy_amount_sums[:nr_orders + 1]
+        columns.max_sell_amount_mins = None
+        if self.max_sell_amount_mins is not None:
+            columns.max_sell_amount_mins = self.max_sell_amount_mins[:nr_orders]
+        return columns
+
+    def buy_amounts(self):
+        return [order.buy_amount for order in self.orders]
+
+    def sum_max_sell_amounts(self, start=0, stop=None):
+        """Total max_sell_amount of orders[start:stop]."""
+        if stop is None:
+            stop = len(self.orders)
+        return self.max_sell_amount_sums[stop] - self.max_sell_amount_sums[start]
+
+    def sum_min_buy_amounts(self, start=0, stop=None):
+        """Total min buy amount (max_sell_amount / max_xrate) of orders[start:stop]."""
+        if self.min_buy_amount_sums is None:
+            self.min_buy_amount_sums = [0] + list(accumulate(
+                F(max_sell_amount) / max_xrate for max_sell_amount, max_xrate
+                in zip(self.max_sell_amounts, self.max_xrates)
+            ))
+        if stop is None:
+            stop = len(self.orders)
+        return self.min_buy_amount_sums[stop] - self.min_buy_amount_sums[start]
+
+    def min_max_sell_amount(self, stop):
+        """Minimum max_sell_amount of orders[:stop] (with stop > 0)."""
+        if self.max_sell_amount_mins is None:
+            self.max_sell_amount_mins = list(accumulate(self.max_sell_amounts, min))
+        return self.max_sell_amount_mins[stop - 1]
+
+    def count_orders_executable_with_sell_amount(self, nr_orders, sell_amount):
+        """Number of orders among the first nr_orders that are completely
+        executed when executing them (in order) with a total sell amount of
+        sell_amount, and the sell amount of the next (partially executed) one."""
+        sums = self.max_sell_amount_sums
+        nr_executed_orders = bisect_right(sums, sell_amount, 0, nr_orders + 1) - 1
+        return nr_executed_orders, sell_amount - sums[nr_executed_orders]
+
+    def count_orders_with_max_xrate_at_least(self, max_xrate_lb):
+        """Number of (leading) orders with max_xrate >= max_xrate_lb."""
+        return bisect_right(NegatedKeys(self.max_xrates), -max_xrate_lb)
+
+    def count_common_leading_orders(self, other):
+        """Number of leading orders with the same max_xrates and max_sell_amounts
+        as in the other columns."""
+        nr_orders = min(len(self), len(other))
+        for i in range(nr_orders):
+            if self.max_xrates[i] != other.max_xrates[i] \
+                    or self.max_sell_amounts[i] != other.max_sell_amounts[i]:
+                return i
+        return nr_orders
+
+    def partially_executable_range(self, nr_orders, sell_amount_lb, sell_amount_ub):
+        """Range of indexes i < nr_orders such that, when executing the first
+        nr_orders orders with a total sell amount in [sell_amount_lb, sell_amount_ub],
+        orders[i] can be the one partially executed, i.e.:
+
+        sum_max_sell_amounts(0, i) <= sell_amount_ub, and
+        sum_max_sell_amounts(0, i + 1) >= sell_amount_lb.
+        """
+        sums = self.max_sell_amount_sums
+        start = max(bisect_left(sums, sell_amount_lb, 0, nr_orders + 1) - 1, 0)
+        stop = bisect_right(sums, sell_amount_ub, 0, nr_orders)
+        return range(start, stop)
+
+
+class PairOrderBook:
+    """Orders of a token pair (and optionally of the fee token) stored as columns.
+
+    b_orders buy b_buy_token for s_buy_token, s_orders buy s_buy_token for
+    b_buy_token, f_orders buy b_buy_token for the fee token.
+    """
+    __slots__ = ('b_orders', 's_orders', 'f_orders')
+
+    def __init__(self, b_orders, s_orders, f_orders=(), presorted=False):
+        self.b_orders = OrderColumns(b_orders, presorted)
+        self.s_orders = OrderColumns(s_orders, presorted)
+        self.f_orders = OrderColumns(list(f_orders), presorted)
 
 
 def compute_sell_amounts_from_buy_amounts(
@@ -135,8 +287,20 @@ def aggregate_orders_prices(
     return orders, prices
 
 
-def count_orders_satisfying_xrate(b_orders, xrate, fee):
-    return sum(xrate <= b_order.max_xrate * (1 - fee.value) for b_order in b_orders)
+def count_orders_satisfying_xrate(b_orders, xrate, fee, presorted=False):
+    """Count the orders satisfying xrate <= max_xrate * (1 - fee).
+
+    If the orders are sorted by execution priority (presorted=True), these are
+    a prefix of the orders, whose length is found by binary search.
+    """
+    if not presorted:
+        return sum(xrate <= b_order.max_xrate * (1 - fee.value) for b_order in b_orders)
+
+    # Orders are sorted by decreasing max_xrate.
+    return bisect_right(
+        NegatedKeys(b_orders, key=lambda b_order: b_order.max_xrate * (1 - fee.value)),
+        -xrate
+    )
 
 
 def prune_unrealizable_orders(b_orders, s_orders, fee):
@@ -150,3 +314,26 @@ def prune_unrealizable_orders(b_orders, s_orders, fee):
     b_orders = [o for o in b_orders if o.max_xrate * f2 >= 1 / s_max_xrate]
     s_orders = [o for o in s_orders if o.max_xrate * f2 >= 1 / b_max_xrate]
     return b_orders, s_orders
+
+
+def prune_unrealizable_pair_orders(order_book, fee):
+    """Remove orders that are trivially unmatchable from a PairOrderBook.
+
+    Same as prune_unrealizable_orders, but since orders are sorted by max_xrate
+    the remaining orders are prefixes, found by binary search.
+    """
+    b_orders, s_orders = order_book.b_orders, order_book.s_orders
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return order_book
+    f2 = (1 - fee.value) ** 2
+    b_max_xrate = b_orders.max_xrates[0]
+    s_max_xrate = s_orders.max_xrates[0]
+    pruned_order_book = PairOrderBook.__new__(PairOrderBook)
+    pruned_order_book.b_orders = b_orders.head(
+        b_orders.count_orders_with_max_xrate_at_least(1 / (s_max_xrate * f2))
+    )
+    pruned_order_book.s_orders = s_orders.head(
+        s_orders.count_orders_with_max_xrate_at_least(1 / (b_max_xrate * f2))
+    )
+    pruned_order_book.f_orders = order_book.f_orders
+    return pruned_order_book
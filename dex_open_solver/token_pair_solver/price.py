@@ -31,8 +31,10 @@ def create_market_order(
 
 
 # Find a subset of f_orders (sell fee for buy_token) that can cover buy_token_imbalance.
+# If f_orders are already sorted by execution priority (presorted=True), they are not
+# sorted again.
 def compute_token_price_to_cover_imbalance(
-    buy_token, fee, buy_token_imbalance, f_orders
+    buy_token, fee, buy_token_imbalance, f_orders, presorted=False
 ):
     # The max sell amount is the current fee imbalance plus an estimate
     # of the imbalance obtained when rounding to integers.
@@ -45,7 +47,9 @@ def compute_token_price_to_cover_imbalance(
     )
 
     # Compute the optimal xrate, which is the absolute b_buy_token_price.
-    xrate, _ = find_best_xrate([buy_fee_market_order], f_orders, fee)
+    xrate, _ = find_best_xrate(
+        [buy_fee_market_order], f_orders, fee, presorted=presorted
+    )
 
     # Note: xrate = fee_token_price / buy_token_price.
 
@@ -0,0 +1,366 @@
+"""Approximate (floating point) objective evaluation, for screening xrates.
+
+Evaluating the objective at an xrate exactly, i.e.
+`SymbolicSolver.compute_objective_from_columns`, is expensive: all amounts are
+Fractions whose numerators and denominators keep growing. The functions here
+mirror it in floating point arithmetic, on the same prefix sums of the order
+columns (so that each evaluation takes as many operations, but on floats), so
+that candidate xrates can be compared and discarded cheaply, and only the
+remaining ones are evaluated exactly:
+
+- every discrete decision taken (e.g. whether a side constraint is binding, or
+  which of two orders is filled first) must be decided by a margin larger than
+  the floating point error, otherwise the evaluation is aborted (the xrate is
+  too close to call, and must be evaluated exactly),
+- the evaluation is also aborted if the amounts overflow floating point numbers,
+- the objective is returned along with a (conservative) bound on its error.
+
+Hence, whenever two approximate objectives differ by more than the sum of their
+error bounds, their exact counterparts compare the same way.
+"""
+from bisect import bisect_left, bisect_right
+from math import isfinite
+
+from ..core.config import Config
+from .amount import MIN_TRADABLE_AMOUNT
+
+# Relative tolerance for floating point errors. Much larger than the errors
+# accumulated by the (few) operations done on each amount.
+TOLERANCE = 1e-9
+
+
+class TooCloseToCall(Exception):
+    pass
+
+
+class FloatValues:
+    """Read-only sequence of some (exact) values as floats, converted on access.
+
+    Allows searching the prefix sums of OrderColumns in floating point
+    arithmetic with bisect, without converting all of them.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return float(self.values[i])
+
+
+class ApproxObjective:
+    """Approximate objective (with b_buy_token_price=1 and no f_orders) as a
+    function of the xrate and of the number of executable orders, for the orders
+    of a PairOrderBook.
+
+    Mirrors `SymbolicSolver.compute_objective_from_columns` (and
+    `SymbolicSolver.compute_objective_by_bounded_execution`).
+    """
+    def __init__(self, order_book, fee):
+        self.b_orders = order_book.b_orders
+        self.s_orders = order_book.s_orders
+        # Computes the min buy amount prefix sums if they were not yet.
+        self.b_orders.sum_min_buy_amounts(0, 0)
+        self.s_orders.sum_min_buy_amounts(0, 0)
+        self.b_max_sell_amount_sums = FloatValues(self.b_orders.max_sell_amount_sums)
+        self.b_min_buy_amount_sums = FloatValues(self.b_orders.min_buy_amount_sums)
+        self.s_max_sell_amount_sums = FloatValues(self.s_orders.max_sell_amount_sums)
+        self.s_min_buy_amount_sums = FloatValues(self.s_orders.min_buy_amount_sums)
+        self.f = float(1 - fee.value)
+        self.fee_token_price = float(Config.FEE_TOKEN_PRICE)
+        self.min_tradable_amount = float(MIN_TRADABLE_AMOUNT)
+
+    def __call__(self, xrate, nr_b_exec_orders, nr_s_exec_orders):
+        """Return (objective, error bound) at xrate, or None if it must be
+        evaluated exactly."""
+        try:
+            return self.evaluate(xrate, nr_b_exec_orders, nr_s_exec_orders)
+        except (TooCloseToCall, OverflowError, ZeroDivisionError):
+            return None
+
+    def evaluate(self, exact_xrate, nr_b_exec_orders, nr_s_exec_orders):
+        xrate = float(exact_xrate)
+        f = self.f
+        b_sell_sums, b_min_buy_sums = \
+            self.b_max_sell_amount_sums, self.b_min_buy_amount_sums
+        s_sell_sums, s_min_buy_sums = \
+            self.s_max_sell_amount_sums, self.s_min_buy_amount_sums
+
+        # Orders are executed in order on each side until the traded volume (in
+        # s_buy_token) is exhausted on one of them, which is completely filled.
+        # If the side or the partially executed orders can't be told apart (in
+        # which case the min tradable amount constraint may be binding, on a
+        # tiny partially executed amount), replay the bounded execution.
+        b_volume = b_sell_sums[nr_b_exec_orders]
+        s_volume = s_sell_sums[nr_s_exec_orders] * xrate * f
+        try:
+            if less(s_volume, b_volume, TOLERANCE * max(b_volume, s_volume)):
+                volume = s_volume
+                nr_s_filled_orders, s_partial_sell_amount = nr_s_exec_orders, 0.0
+                nr_b_filled_orders, b_partial_sell_amount = count_filled_orders(
+                    b_sell_sums, nr_b_exec_orders, volume
+                )
+            else:
+                volume = b_volume
+                nr_b_filled_orders, b_partial_sell_amount = nr_b_exec_orders, 0.0
+                nr_s_filled_orders, s_partial_sell_amount = count_filled_orders(
+                    s_sell_sums, nr_s_exec_orders, volume / (xrate * f)
+                )
+        except TooCloseToCall:
+            return self.evaluate_by_bounded_execution(
+                xrate, nr_b_exec_orders, nr_s_exec_orders
+            )
+
+        # Replay the bounded execution if a side constraint may be binding (both
+        # evaluations agree when none is). Partially executed amounts are known
+        # up to an error relative to the volume.
+        if volume > 0:
+            nr_exec_orders = nr_b_filled_orders + nr_s_filled_orders \
+                + (b_partial_sell_amount > 0) + (s_partial_sell_amount > 0)
+            b_min_sell_amount = float(self.b_orders.min_max_sell_amount(nr_b_exec_orders))
+            s_min_sell_amount = float(self.s_orders.min_max_sell_amount(nr_s_exec_orders))
+            if b_partial_sell_amount > 0:
+                b_min_sell_amount = min(b_min_sell_amount, b_partial_sell_amount)
+            if s_partial_sell_amount > 0:
+                s_min_sell_amount = min(s_min_sell_amount, s_partial_sell_amount)
+            if nr_exec_orders > Config.MAX_NR_EXEC_ORDERS or not (
+                self.is_tradable(b_min_sell_amount, f / xrate, b_volume)
+                and self.is_tradable(s_min_sell_amount, xrate * f, s_volume / (xrate * f))
+            ):
+                return self.evaluate_by_bounded_execution(
+                    xrate, nr_b_exec_orders, nr_s_exec_orders
+                )
+
+        # 2u-umax terms (see compute_objective_from_columns).
+        def filled_minus_unfilled_sums(
+            sell_sums, min_buy_sums, nr_filled_orders, partial, nr_exec_orders
+        ):
+            start_U = nr_filled_orders + (partial > 0)
+            return (
+                sell_sums[nr_filled_orders]
+                - (sell_sums[nr_exec_orders] - sell_sums[start_U]),
+                min_buy_sums[nr_filled_orders]
+                - (min_buy_sums[nr_exec_orders] - min_buy_sums[start_U])
+            )
+
+        b_yb, b_ybpi = filled_minus_unfilled_sums(
+            b_sell_sums, b_min_buy_sums,
+            nr_b_filled_orders, b_partial_sell_amount, nr_b_exec_orders
+        )
+        s_yb, s_ybpi = filled_minus_unfilled_sums(
+            s_sell_sums, s_min_buy_sums,
+            nr_s_filled_orders, s_partial_sell_amount, nr_s_exec_orders
+        )
+        objective = f / xrate * b_yb - b_ybpi + f * s_yb - s_ybpi / xrate
+
+        if b_partial_sell_amount > 0:
+            i = nr_b_filled_orders
+            objective += (
+                2 * b_partial_sell_amount - float(self.b_orders.max_sell_amounts[i])
+            ) * (f / xrate - 1 / float(self.b_orders.max_xrates[i]))
+        if s_partial_sell_amount > 0:
+            i = nr_s_filled_orders
+            objective += (
+                2 * s_partial_sell_amount - float(self.s_orders.max_sell_amounts[i])
+            ) * (f - 1 / (xrate * float(self.s_orders.max_xrates[i])))
+
+        b_buy_token_imbalance = volume / (xrate * f) - volume * f / xrate
+        objective += b_buy_token_imbalance / self.fee_token_price / 2
+
+        # The error is relative to the magnitude of the operands: every prefix
+        # sum used is at most the one of all executable orders (the partially
+        # executed orders included), and is used at most three times.
+        return self.with_error_bound(
+            objective, 3, xrate, volume, nr_b_exec_orders, nr_s_exec_orders
+        )
+
+    def evaluate_by_bounded_execution(self, xrate, nr_b_exec_orders, nr_s_exec_orders):
+        """Mirror of `SymbolicSolver.compute_objective_by_bounded_execution`."""
+        f = self.f
+        min_tradable_amount = self.min_tradable_amount
+        max_nr_exec_orders = Config.MAX_NR_EXEC_ORDERS
+
+        # Returns the column indexes of the tradable orders, and the traded
+        # volume before each of them (and after the last one).
+        def tradable_orders(orders, nr_exec_orders, min_sell_amount, volume_factor):
+            indexes = []
+            sell_amount_sum = 0.0
+            volumes = [0.0]
+            for i in range(nr_exec_orders):
+                if len(indexes) == max_nr_exec_orders:
+                    break
+                sell_amount = float(orders.max_sell_amounts[i])
+                if less_equal(min_sell_amount, sell_amount):
+                    indexes.append(i)
+                    sell_amount_sum += sell_amount
+                    volumes.append(sell_amount_sum * volume_factor)
+            return indexes, volumes
+
+        b_indexes, b_volumes = tradable_orders(
+            self.b_orders, nr_b_exec_orders,
+            max(min_tradable_amount, min_tradable_amount * xrate / f), 1.0
+        )
+        s_indexes, s_volumes = tradable_orders(
+            self.s_orders, nr_s_exec_orders,
+            max(min_tradable_amount, min_tradable_amount / (xrate * f)), xrate * f
+        )
+
+        # The execution compares volumes of b_orders and s_orders, which must be
+        # told apart (except the initial zero volumes, which are exact).
+        check_volumes_apart(b_volumes[1:], s_volumes[1:])
+
+        # Execute matching orders, bounded by the max_nr_exec_orders constraint.
+        volume = 0.0
+        b_i, s_i = 0, 0
+        while b_i < len(b_indexes) and s_i < len(s_indexes) \
+                and b_i + s_i < max_nr_exec_orders:
+            volume = min(b_volumes[b_i + 1], s_volumes[s_i + 1])
+            b_i += b_volumes[b_i + 1] == volume
+            s_i += s_volumes[s_i + 1] == volume
+
+        # Point b_i, s_i to the last executed orders.
+        def last_executed_order(volumes, volume):
+            return bisect_left(volumes, volume) - 1
+
+        b_i = last_executed_order(b_volumes, volume)
+        s_i = last_executed_order(s_volumes, volume)
+
+        if b_i + s_i + 2 > max_nr_exec_orders:
+            volume = max(b_volumes[b_i], s_volumes[s_i])
+            b_i = last_executed_order(b_volumes, volume)
+            s_i = last_executed_order(s_volumes, volume)
+
+        # Undo the last executed orders while they violate the min tradable amount.
+        undone_order_execution = True
+        while undone_order_execution and b_i >= 0:
+            undone_order_execution = False
+            b_sell_amount = volume - b_volumes[b_i]
+            if not self.is_tradable(b_sell_amount, f / xrate, volume, strict=True):
+                volume = b_volumes[b_i]
+                b_i -= 1
+                s_i = last_executed_order(s_volumes, volume)
+                undone_order_execution = True
+            if s_i < 0:
+                break
+            s_buy_amount = volume - s_volumes[s_i]
+            if not self.is_tradable(s_buy_amount, 1 / (xrate * f), volume, strict=True):
+                volume = s_volumes[s_i]
+                s_i -= 1
+                b_i = last_executed_order(b_volumes, volume)
+                undone_order_execution = True
+
+        # Total min buy amount of the executed orders (weighted by the executed
+        # fraction). Summed order by order, since there are few of them.
+        def sum_exec_min_buy_amounts(orders, indexes, i, sell_amount):
+            if i < 0:
+                return 0.0
+            return sum(
+                float(orders.max_sell_amounts[j]) / float(orders.max_xrates[j])
+                for j in indexes[:i]
+            ) + sell_amount / float(orders.max_xrates[indexes[i]])
+
+        b_ybpi = sum_exec_min_buy_amounts(
+            self.b_orders, b_indexes, b_i, volume - b_volumes[b_i] if b_i >= 0 else 0.0
+        )
+        s_ybpi = sum_exec_min_buy_amounts(
+            self.s_orders, s_indexes, s_i,
+            (volume - s_volumes[s_i]) / (xrate * f) if s_i >= 0 else 0.0
+        )
+
+        u = f / xrate * volume - b_ybpi + volume / xrate - s_ybpi / xrate
+        umax = f / xrate * self.b_max_sell_amount_sums[nr_b_exec_orders] \
+            - self.b_min_buy_amount_sums[nr_b_exec_orders] \
+            + f * self.s_max_sell_amount_sums[nr_s_exec_orders] \
+            - self.s_min_buy_amount_sums[nr_s_exec_orders] / xrate
+
+        b_buy_token_imbalance = volume / (xrate * f) - volume * f / xrate
+        objective = 2 * u - umax + b_buy_token_imbalance / self.fee_token_price / 2
+
+        # All executed amounts are at most the ones of all executable orders,
+        # and are used at most three times (2u, and umax).
+        return self.with_error_bound(
+            objective, 3, xrate, volume, nr_b_exec_orders, nr_s_exec_orders
+        )
+
+    def is_tradable(self, amount, factor, amount_ub, strict=False):
+        """Whether both amount and amount * factor are at least the min tradable
+        amount, where amount is only known up to an error relative to amount_ub.
+
+        Unless strict, this is conservative: amounts that are too close to call
+        are not tradable. Otherwise, raises TooCloseToCall for them.
+        """
+        error = TOLERANCE * amount_ub * max(1.0, factor)
+        try:
+            return not less(min(amount, amount * factor), self.min_tradable_amount, error)
+        except TooCloseToCall:
+            if strict:
+                raise
+            return False
+
+    def with_error_bound(
+        self, objective, factor, xrate, volume, nr_b_exec_orders, nr_s_exec_orders
+    ):
+        """Return the objective and its error bound, i.e. relative to factor times
+        the magnitude of the amounts of all executable orders, and the volume."""
+        f = self.f
+        magnitude = factor * (
+            f / xrate * self.b_max_sell_amount_sums[nr_b_exec_orders]
+            + self.b_min_buy_amount_sums[nr_b_exec_orders]
+            + f * self.s_max_sell_amount_sums[nr_s_exec_orders]
+            + self.s_min_buy_amount_sums[nr_s_exec_orders] / xrate
+        ) + (volume / (xrate * f) + volume * f / xrate) / self.fee_token_price
+        if not isfinite(objective) or not isfinite(magnitude):
+            return None
+        return objective, TOLERANCE * magnitude
+
+
+def count_filled_orders(sell_sums, nr_orders, sell_amount):
+    """Mirror of OrderColumns.count_orders_executable_with_sell_amount.
+
+    sell_amount is less than the total max_sell_amount of the orders. Raises
+    TooCloseToCall if it can't be told apart from the total max_sell_amount of
+    the filled orders, or of the filled and the partially executed ones.
+    """
+    if sell_amount == 0:
+        return 0, 0.0
+    nr_filled_orders = bisect_right(sell_sums, sell_amount, 0, nr_orders + 1) - 1
+    error = TOLERANCE * sell_amount
+    less(sell_sums[nr_filled_orders], sell_amount, error)
+    if nr_filled_orders < nr_orders:
+        less(sell_amount, sell_sums[nr_filled_orders + 1], error)
+    else:
+        raise TooCloseToCall()
+    return nr_filled_orders, sell_amount - sell_sums[nr_filled_orders]
+
+
+def check_volumes_apart(volumes1, volumes2):
+    """Raises TooCloseToCall unless all volumes1 can be told apart from all
+    volumes2 (both sorted)."""
+    i, j = 0, 0
+    while i < len(volumes1) and j < len(volumes2):
+        less(volumes1[i], volumes2[j], TOLERANCE * max(volumes1[i], volumes2[j]))
+        if volumes1[i] < volumes2[j]:
+            i += 1
+        else:
+            j += 1
+
+
+def less(a, b, error):
+    """a < b, where a - b is only known up to the given error.
+
+    Raises TooCloseToCall if a and b can not be told apart.
+    """
+    if abs(a - b) <= error:
+        raise TooCloseToCall()
+    return a < b
+
+
+def less_equal(a, b):
+    """a <= b, where a and b are only known up to a relative error.
+
+    Raises TooCloseToCall if a and b can not be told apart.
+    """
+    return not less(b, a, TOLERANCE * max(abs(a), abs(b)))
@@ -1,43 +1,48 @@
 import json
 import logging
 import time
-from copy import deepcopy
 from decimal import Decimal as D
 from fractions import Fraction as F
-from math import ceil, floor
+from math import ceil, floor, inf, sqrt
 
 from ..core.api import Stats, dump_solution
 from ..core.config import Config
+from ..core.order_util import FixedPointTraits
 from ..core.orderbook import (compute_approx_economic_viable_subset,
                               count_nr_exec_orders, is_economic_viable,
-                              is_trivial, sorted_orders_by_exec_priority)
+                              is_trivial, restore_execution,
+                              snapshot_execution, sorted_orders_by_exec_priority)
 from ..core.round import round_solution
+from ..core.util import Deadline, is_expired
 from ..core.validation import validate
 from .amount import compute_buy_amounts
 from .api import load_problem
 from .orderbook import (IntegerTraits, RationalTraits, aggregate_orders_prices,
-                        compute_b_buy_token_imbalance,
-                        compute_objective_rational,
+                        compute_b_buy_token_imbalance, compute_objective,
                         count_orders_satisfying_xrate,
                         prune_unrealizable_orders)
 from .price import compute_token_price_to_cover_imbalance, create_market_order
 from .round import rounding_buffer
-from .xrate import find_best_xrate
+from .xrate import XrateSearchCache, find_best_xrate
 
 logger = logging.getLogger(__name__)
 
 TRIVIAL_SOLUTION = ([], {})
 
+INVERSE_GOLDEN_RATIO = (sqrt(5) - 1) / 2
 
-def compute_s_buy_token_price(b_buy_token_price, xrate, b_orders, s_orders, fee):
+
+def compute_s_buy_token_price(
+    b_buy_token_price, xrate, b_orders, s_orders, fee, presorted=False
+):
     s_buy_token_price_up = ceil(b_buy_token_price / xrate)
     s_buy_token_price_down = floor(b_buy_token_price / xrate)
     xrate_up = F(b_buy_token_price, s_buy_token_price_up)
     xrate_down = F(b_buy_token_price, s_buy_token_price_down)
-    cu = count_orders_satisfying_xrate(b_orders, xrate_up, fee) + \
-        count_orders_satisfying_xrate(s_orders, 1 / xrate_up, fee)
-    cd = count_orders_satisfying_xrate(b_orders, xrate_down, fee) + \
-        count_orders_satisfying_xrate(s_orders, 1 / xrate_down, fee)
+    cu = count_orders_satisfying_xrate(b_orders, xrate_up, fee, presorted) + \
+        count_orders_satisfying_xrate(s_orders, 1 / xrate_up, fee, presorted)
+    cd = count_orders_satisfying_xrate(b_orders, xrate_down, fee, presorted) + \
+        count_orders_satisfying_xrate(s_orders, 1 / xrate_down, fee, presorted)
     if cu > cd:
         return s_buy_token_price_up
     else:
@@ -50,11 +55,19 @@ def solve_token_pair(
     fee,
     xrate=None,
     b_buy_token_price=None,
-    max_nr_exec_orders=None
+    max_nr_exec_orders=None,
+    deadline=None,
+    presorted=False,
+    xrate_search_cache=None
 ):
     """Find optimal execution of b_orders and s_orders.
 
     Sets b_orders/s_orders buy_amount and returns optimal exchange rate.
+
+    If b_orders and s_orders are already sorted by execution priority
+    (presorted=True), they are not sorted again.
+
+    The (optional) xrate_search_cache is passed to find_best_xrate.
     """
 
     # NOTE: do not add this as a default parameter above, since
@@ -74,7 +87,10 @@ def solve_token_pair(
 
     # Compute optimal exchange rate if not given.
     if xrate is None:
-        xrate, _ = find_best_xrate(b_orders, s_orders, fee)
+        xrate, _ = find_best_xrate(
+            b_orders, s_orders, fee, deadline=deadline, presorted=presorted,
+            cache=xrate_search_cache
+        )
         logger.debug(
             "p(%s) / p(%s) = %s (precise arithmetic)",
             b_buy_token,
@@ -90,21 +106,23 @@ def solve_token_pair(
     # and s_buy_token_price is an integer.
     if b_buy_token_price is not None:
         s_buy_token_price = compute_s_buy_token_price(
-            b_buy_token_price, xrate, b_orders, s_orders, fee
+            b_buy_token_price, xrate, b_orders, s_orders, fee, presorted
         )
         xrate = F(b_buy_token_price, s_buy_token_price)
         logger.debug("Adjusted xrate\t:\t%s", xrate)
 
     # Execute orders based on optimal exchange rate.
     compute_buy_amounts(
-        xrate, b_orders, s_orders, fee, max_nr_exec_orders=max_nr_exec_orders
+        xrate, b_orders, s_orders, fee,
+        max_nr_exec_orders=max_nr_exec_orders,
+        presorted=presorted
     )
 
     return xrate
 
 
 def solve_b_buy_token_and_fee_token(
-    b_buy_token_imbalance, b_buy_token, b_orders, f_orders, fee
+    b_buy_token_imbalance, b_buy_token, b_orders, f_orders, fee, presorted=False
 ):
     """Find optimal execution of b_orders and f_orders.
 
@@ -115,6 +133,9 @@ def solve_b_buy_token_and_fee_token(
 
     Future work: also consider other orders selling b_buy_token for fee.
 
+    If f_orders are already sorted by execution priority (presorted=True), they
+    are not sorted again.
+
     Returns price of b_buy_token.
     """
 
@@ -125,7 +146,8 @@ def solve_b_buy_token_and_fee_token(
         buy_token=b_buy_token,
         fee=fee,
         buy_token_imbalance=b_buy_token_imbalance,
-        f_orders=f_orders
+        f_orders=f_orders,
+        presorted=presorted
     )
 
     # Execute orders that buy the b_buy_token imbalance due to fee for fee.
@@ -142,7 +164,8 @@ def solve_b_buy_token_and_fee_token(
     fee_xrate = solve_token_pair(
         (fee.token, b_buy_token),
         [fee_debt_order], f_orders, fee,
-        xrate=fee_xrate
+        xrate=fee_xrate,
+        presorted=presorted
     )
     assert fee_xrate is not None
 
@@ -191,15 +214,16 @@ def solve_token_pair_and_fee_token_given_exec_f_orders(
     token_pair,
     b_orders, s_orders, f_orders,
     xrate,
-    fee
+    fee,
+    arith_traits=RationalTraits
 ):
     """Match orders between token pair and the fee token, assuming
     that there will be at most `nr_exec_f_orders` orders selling
     fee for b_buy_token.
 
     Sets b_orders/s_orders/f_orders buy_amounts for the best execution.
-    Return the objective value f, the exchange rate b/s, and the exchange
-    rate b/f (i.e. the price of b_token).
+    Return the objective value f (computed with the given arith_traits), the
+    exchange rate b/s, and the exchange rate b/f (i.e. the price of b_token).
     """
     b_buy_token, s_buy_token = token_pair
 
@@ -207,7 +231,8 @@ def solve_token_pair_and_fee_token_given_exec_f_orders(
     b_buy_token_price = solve_b_buy_token_and_fee_token(
         approx_b_buy_token_imbalance,
         b_buy_token, b_orders, f_orders[:nr_exec_f_orders],
-        fee=fee
+        fee=fee,
+        presorted=True
     )
 
     # It can happen (due to side constraints) that the number of executed
@@ -231,6 +256,9 @@ def solve_token_pair_and_fee_token_given_exec_f_orders(
 
     # Execute orders with slightly decreased max_sell_amounts so that later on
     # is possible to round solution without violating the max sell amount constraint.
+    # The orders remain sorted by execution priority, since the max_sell_amounts of
+    # all orders on one side are decreased by the same amount (orders whose
+    # max_sell_amount drops to zero may be reordered, but are never executed).
     with rounding_buffer(token_pair, b_orders, s_orders, xrate, b_buy_token_price, fee):
         adjusted_xrate = solve_token_pair(
             token_pair,
@@ -238,22 +266,115 @@ def solve_token_pair_and_fee_token_given_exec_f_orders(
             fee,
             xrate=xrate,
             b_buy_token_price=b_buy_token_price,
-            max_nr_exec_orders=max_nr_bs_exec_orders
+            max_nr_exec_orders=max_nr_bs_exec_orders,
+            presorted=True
         )
 
-    objective = compute_objective_rational(
+    objective = compute_objective(
         b_orders, s_orders, f_orders,
         adjusted_xrate,
         b_buy_token_price,
-        fee
+        fee,
+        arith_traits
     )
 
     return (objective, adjusted_xrate, b_buy_token_price)
 
 
+def scan_nr_exec_f_orders(
+    evaluate, min_nr_exec_f_orders, max_nr_exec_f_orders, deadline=None
+):
+    """Find the number of f_orders to execute with the best objective, by
+    trying all of them in increasing order.
+
+    evaluate(nr_exec_f_orders) returns the objective value for the given number
+    of executed f_orders, or None if there is no solution.
+
+    Returns the best number of f_orders found (the largest one in case of ties),
+    or None if there is no solution for any of them.
+    """
+    best_nr_exec_f_orders = None
+    best_objective = None
+    for nr_exec_f_orders in range(min_nr_exec_f_orders, max_nr_exec_f_orders + 1):
+
+        # Keep the best solution found so far if the deadline expires.
+        if is_expired(deadline):
+            logger.debug("Deadline expired: stopping search on nr_exec_f_orders.")
+            break
+
+        objective = evaluate(nr_exec_f_orders)
+
+        # Skip iteration if there is no solution.
+        if objective is None:
+            continue
+
+        # Optimization: Since f_orders are ordered by limit xrate, the objective
+        # as a function of the size of the prefix used has only one optimum.
+        # In other words, we can stop trying to augmenting the set of f_orders
+        # once adding a new f_order degrades the objective.
+        if best_objective is not None and objective < best_objective:
+            break
+
+        best_nr_exec_f_orders = nr_exec_f_orders
+        best_objective = objective
+
+    return best_nr_exec_f_orders
+
+
+def golden_section_search_nr_exec_f_orders(
+    evaluate, min_nr_exec_f_orders, max_nr_exec_f_orders, deadline=None
+):
+    """Find the number of f_orders to execute with the best objective, by
+    golden-section search.
+
+    Same semantics as `scan_nr_exec_f_orders`, but relies on the objective as a
+    function of the number of f_orders having a single optimum (see there), and
+    on the following observations:
+    * if there is no solution for some number of f_orders, then there is no
+    solution for any smaller number of f_orders either;
+    * ties between objective values only happen after the optimum, once the extra
+    f_orders are no longer executed.
+    Requires O(log n) calls to evaluate(), which should cache its results.
+    """
+    def value(nr_exec_f_orders):
+        objective = evaluate(nr_exec_f_orders)
+        return -inf if objective is None else objective
+
+    lb, ub = min_nr_exec_f_orders, max_nr_exec_f_orders
+    tried = []
+    while lb <= ub:
+
+        # Keep the best solution found so far if the deadline expires.
+        if is_expired(deadline):
+            logger.debug("Deadline expired: stopping search on nr_exec_f_orders.")
+            break
+
+        if ub - lb <= 2:
+            tried += range(lb, ub + 1)
+            break
+
+        delta = ceil((ub - lb) * INVERSE_GOLDEN_RATIO)
+        nr1, nr2 = ub - delta, lb + delta
+        tried += [nr1, nr2]
+        if value(nr1) < value(nr2) or value(nr1) == -inf:
+            lb = nr1 + 1
+        else:
+            ub = nr2 - 1
+
+    # In case of ties, return the largest number of f_orders, as the scan does.
+    return max(
+        (nr for nr in tried if evaluate(nr) is not None),
+        key=lambda nr: (value(nr), nr),
+        default=None
+    )
+
+
 def solve_token_pair_and_fee_token(
     token_pair, accounts, b_orders, s_orders, f_orders, fee,
-    xrate=None
+    xrate=None,
+    deadline=None,
+    xrate_search_cache=None,
+    arith_traits=None
 ):
     """Match orders between token pair and the fee token, taking into account
     all side constraints except economic viability. This means the solution obtained
@@ -263,14 +384,33 @@ def solve_token_pair_and_fee_token(
     If xrate is given, then it will be used instead of trying to find
     optimal xrate.
 
+    If the (optional) deadline expires, the best solution found so far is used.
+
+    If an (optional) XrateSearchCache is given, the search for the optimal xrate
+    reuses the objectives computed by the previous search using it.
+
+    The objectives of the solutions for each number of executed f_orders are
+    computed with the given arith_traits (by default, FixedPointTraits if
+    Config.FIXED_POINT_OBJECTIVE is set, RationalTraits otherwise). Buy amounts
+    are always computed exactly.
+
     Sets b_orders/s_orders/f_orders (integral) buy_amounts for the best execution.
     """
+    if arith_traits is None:
+        arith_traits = FixedPointTraits if Config.FIXED_POINT_OBJECTIVE \
+            else RationalTraits
+
     # remove trivially infeasible orders
     b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, fee)
 
     if len(b_orders) == 0 or len(s_orders) == 0:
         return TRIVIAL_SOLUTION
 
+    # Sort orders by execution priority, once: all the functions below keep this
+    # order (e.g. when filtering orders by xrate), instead of sorting again.
+    b_orders = sorted_orders_by_exec_priority(b_orders)
+    s_orders = sorted_orders_by_exec_priority(s_orders)
+
     # This function does not support s_buy_token = fee token.
     if token_pair[1] == fee.token:
         token_pair = tuple(reversed(token_pair))
@@ -289,7 +429,10 @@ def solve_token_pair_and_fee_token(
         "=== Solving %s -- %s (rational arithmetic) ===",
         b_buy_token, s_buy_token
     )
-    xrate = solve_token_pair(token_pair, b_orders, s_orders, fee, xrate=xrate)
+    xrate = solve_token_pair(
+        token_pair, b_orders, s_orders, fee, xrate=xrate, deadline=deadline,
+        presorted=True, xrate_search_cache=xrate_search_cache
+    )
 
     if count_nr_exec_orders(b_orders) == 0:
         logger.info("No matching orders between %s and %s.", b_buy_token, s_buy_token)
@@ -335,46 +478,54 @@ def solve_token_pair_and_fee_token(
         )
 
         # Find number of f_orders that leads to higher objective value.
+        # The solution for each number of f_orders tried is cached, since the
+        # search may compare it several times. Only the execution of the orders
+        # is recorded, and the best one restored afterwards.
         f_orders = sorted_orders_by_exec_priority(f_orders)
-        best_objective = None
-        best_solution = (xrate, None, b_orders, s_orders, f_orders)
-        for nr_exec_f_orders in range(min_nr_exec_f_orders, max_nr_exec_f_orders + 1):
-
-            # Reset exec amounts of f orders.
-            for f_order in f_orders:
-                f_order.buy_amount = 0
-                f_order.sell_amount = 0
-
-            # Compute objective value and solution given current nr_exec_f_orders.
-            objective, adjusted_xrate, b_buy_token_price = \
-                solve_token_pair_and_fee_token_given_exec_f_orders(
-                    nr_exec_f_orders, b_buy_token_imbalance,
-                    token_pair, b_orders, s_orders, f_orders, xrate, fee
+        orders = b_orders + s_orders + f_orders
+        solutions = {}
+
+        def evaluate(nr_exec_f_orders):
+            if nr_exec_f_orders not in solutions:
+                # Reset exec amounts of f orders.
+                for f_order in f_orders:
+                    f_order.buy_amount = 0
+                    f_order.sell_amount = 0
+
+                # Compute objective value and solution given current nr_exec_f_orders.
+                objective, adjusted_xrate, b_buy_token_price = \
+                    solve_token_pair_and_fee_token_given_exec_f_orders(
+                        nr_exec_f_orders, b_buy_token_imbalance,
+                        token_pair, b_orders, s_orders, f_orders, xrate, fee,
+                        arith_traits
+                    )
+
+                # Discard solution if it was not possible to connect to fee token.
+                if b_buy_token_price is None:
+                    objective = None
+                logger.debug(
+                    "Objective\t:\t%s\t(nr_exec_f_orders=%s)",
+                    objective, nr_exec_f_orders
                 )
+                solutions[nr_exec_f_orders] = (
+                    objective, adjusted_xrate, b_buy_token_price,
+                    snapshot_execution(orders)
+                )
+            return solutions[nr_exec_f_orders][0]
 
-            # Skip iteration if it was not possible to connect to fee token.
-            if b_buy_token_price is None:
-                continue
-
-            assert objective is not None
-
-            logger.debug("Objective\t:\t%s\t[best=%s]", objective, best_objective)
-
-            # Optimization: Since f_orders are ordered by limit xrate, the objective
-            # as a function of the size of the prefix used has only one optimum.
-            # In other words, we can stop trying to augmenting the set of f_orders
-            # once adding a new f_order degrades the objective.
-            if best_objective is not None and objective < best_objective:
-                break
-
-            # Update best solution found so far if necessary.
-            assert best_objective is None or objective >= best_objective
-            best_objective = objective
-            best_solution = deepcopy(
-                (adjusted_xrate, b_buy_token_price, b_orders, s_orders, f_orders)
-            )
+        if Config.LINEAR_F_ORDERS_SEARCH:
+            search_nr_exec_f_orders = scan_nr_exec_f_orders
+        else:
+            search_nr_exec_f_orders = golden_section_search_nr_exec_f_orders
+        nr_exec_f_orders = search_nr_exec_f_orders(
+            evaluate, min_nr_exec_f_orders, max_nr_exec_f_orders, deadline=deadline
+        )
 
-        xrate, b_buy_token_price, b_orders, s_orders, f_orders = best_solution
+        if nr_exec_f_orders is not None:
+            _, xrate, b_buy_token_price, execution = solutions[nr_exec_f_orders]
+            restore_execution(orders, execution)
+        else:
+            b_buy_token_price = None
 
         # Return trivial solution in case it was not possible to connect to the fee token.
         # This can happen due to side constraints, for example if the resulting f_orders
@@ -426,9 +577,72 @@ def solve_token_pair_and_fee_token(
     return orders, prices
 
 
+def remove_orders_by_bisection(
+    token_pair, accounts, b_orders, s_orders, f_orders, fee, xrate,
+    orders, prices, economic_viable_subset, deadline=None, xrate_search_cache=None
+):
+    """Remove the least number of b_orders/s_orders that makes the solution
+    economically viable, by bisection.
+
+    Executed orders are removed by increasing volume in the given solution, as when
+    removing them one at a time, but at most the ones outside the (approximate)
+    economically viable subset are removed. Assumes that removing more orders does
+    not make the solution less economically viable, so that the number of
+    re-solves is logarithmic in the number of orders removed.
+
+    Returns the remaining b_orders and s_orders, the solution for them, and whether
+    this solution is economically viable (or trivial). If not, it is the solution
+    with all the orders outside the subset removed, to continue the search from.
+    """
+    bs_order_ids = {o.id for o in b_orders + s_orders}
+    removable_orders = sorted(
+        (o for o in orders if o.buy_amount > 0 and o.id in bs_order_ids),
+        key=lambda o: o.volume(prices)
+    )
+    economic_viable_order_ids = {o.id for o in economic_viable_subset}
+    max_nr_removed_orders = max(1, sum(
+        o.id not in economic_viable_order_ids for o in removable_orders
+    ))
+
+    def solve(nr_removed_orders):
+        removed_order_ids = {o.id for o in removable_orders[:nr_removed_orders]}
+        remaining_b_orders = [o for o in b_orders if o.id not in removed_order_ids]
+        remaining_s_orders = [o for o in s_orders if o.id not in removed_order_ids]
+        orders, prices = solve_token_pair_and_fee_token(
+            token_pair, accounts, remaining_b_orders, remaining_s_orders, f_orders,
+            fee, xrate, deadline=deadline, xrate_search_cache=xrate_search_cache
+        )
+        is_viable = is_economic_viable(orders, prices, fee, IntegerTraits) \
+            or is_trivial(orders)
+        return remaining_b_orders, remaining_s_orders, (orders, prices), is_viable
+
+    # Removing all the orders outside the subset is not always enough.
+    result = solve(max_nr_removed_orders)
+    if not result[3]:
+        return result
+
+    # Find the least number of orders to remove, keeping the execution of the
+    # best solution found so far, since solving mutates the orders.
+    best_result = (result, snapshot_execution(result[2][0]))
+    lb, ub = 1, max_nr_removed_orders - 1
+    while lb <= ub and not is_expired(deadline):
+        nr_removed_orders = (lb + ub) // 2
+        result = solve(nr_removed_orders)
+        if result[3]:
+            best_result = (result, snapshot_execution(result[2][0]))
+            ub = nr_removed_orders - 1
+        else:
+            lb = nr_removed_orders + 1
+
+    result, execution = best_result
+    restore_execution(result[2][0], execution)
+    return result
+
+
 def solve_token_pair_and_fee_token_economic_viable(
     token_pair, accounts, b_orders, s_orders, f_orders, fee,
-    xrate=None
+    xrate=None,
+    deadline=None
 ):
     """Match orders between token pair and the fee token, taking into
     account all side constraints, including economic viability.
@@ -436,6 +650,9 @@ def solve_token_pair_and_fee_token_economic_viable(
     If xrate is given, then it will be used instead of trying to find
     optimal xrate.
 
+    If the (optional) deadline expires before an economically viable
+    solution is found, then the trivial solution is returned.
+
     Sets b_orders/s_orders/f_orders (integral) buy_amounts for the best execution.
     Also returns the (integral) prices found.
     """
@@ -444,29 +661,57 @@ def solve_token_pair_and_fee_token_economic_viable(
     orders, prices = TRIVIAL_SOLUTION
 
     # Search for an economically viable solution.
-    while len(b_orders) > 0 or len(s_orders) > 0:
-
-        # Solve current problem.
-        orders, prices = solve_token_pair_and_fee_token(
-            token_pair, accounts, b_orders, s_orders, f_orders, fee, xrate
-        )
+    # Since each iteration removes orders from the previous one, the searches for
+    # the optimal xrate share a memo of objectives.
+    xrate_search_cache = XrateSearchCache()
+    solution = None
+    while len(b_orders) > 0 and len(s_orders) > 0:
+
+        # Solve current problem (unless already solved when removing orders).
+        if solution is None:
+            solution = solve_token_pair_and_fee_token(
+                token_pair, accounts, b_orders, s_orders, f_orders, fee, xrate,
+                deadline=deadline, xrate_search_cache=xrate_search_cache
+            )
+        orders, prices = solution
+        solution = None
 
         # If solution is economically viable, exit.
         # Hopefully, in large majority of cases this will occur in the first iteration.
         if is_economic_viable(orders, prices, fee, IntegerTraits) or is_trivial(orders):
             break
 
+        # The only valid solution found so far is the trivial solution.
+        if is_expired(deadline):
+            logger.debug("Deadline expired: no economically viable solution found.")
+            orders, prices = TRIVIAL_SOLUTION
+            break
+
         # If solution cannot be made economically viable (assuming prices wouldn't change)
-        if len(compute_approx_economic_viable_subset(
+        economic_viable_subset = compute_approx_economic_viable_subset(
             orders, prices, fee, IntegerTraits
-        )) == 0:
+        )
+        if len(economic_viable_subset) == 0:
             orders, prices = TRIVIAL_SOLUTION
             break
 
-        # Note: to increase performance, we could consider removing all orders that do not
-        # satisfy min_abs_fee_per_order here at once, instead of removing one at a time as
-        # it is currently. The advantage of removing one by one is that it will not remove
-        # more than needed (note that prices, and hence order fees, keep changing).
+        if Config.ECONOMIC_VIABILITY_BATCH_REMOVAL:
+            # Remove as many orders as needed at once (see below).
+            b_orders, s_orders, solution, is_viable = remove_orders_by_bisection(
+                token_pair, accounts, b_orders, s_orders, f_orders, fee, xrate,
+                orders, prices, economic_viable_subset, deadline=deadline,
+                xrate_search_cache=xrate_search_cache
+            )
+            if is_viable:
+                orders, prices = solution
+                break
+            continue
+
+        # Note: to increase performance, all the orders that are not part of the
+        # (approximate) economically viable subset can be removed at once, instead of
+        # one at a time (see Config.ECONOMIC_VIABILITY_BATCH_REMOVAL). The advantage
+        # of removing one by one is that it will not remove more than needed (note that
+        # prices, and hence order fees, keep changing).
 
         # Find and remove the order paying the least fee.
         b_order_with_min_buy_amount = min(
@@ -488,17 +733,23 @@ def solve_token_pair_and_fee_token_economic_viable(
                 o for o in s_orders if o.id != s_order_with_min_buy_amount.id
             ]
 
+    # No orders left to match on one of the sides.
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        orders, prices = TRIVIAL_SOLUTION
+
     # Make sure the solution is correct.
     validate(accounts, orders, prices, fee)
 
     return orders, prices
 
 
-def main(args):
-    start_time = time.time()
+def solve_instance(instance, args, start_time=None):
+    """Match orders on the token pair args.token_pair of an instance (dict).
 
-    # Load dict from json.
-    instance = json.load(args.instance, parse_float=D)
+    Returns the solution orders and prices, and the fee.
+    """
+    time_limit = args.time_limit if hasattr(args, 'time_limit') else None
+    deadline = Deadline(time_limit, start_time)
 
     # Load problem.
     # b_orders: orders buying b_buy_token
@@ -510,9 +761,24 @@ def main(args):
 
     # Find token pair + fee token matching.
     orders, prices = solve_token_pair_and_fee_token_economic_viable(
-        args.token_pair, accounts, b_orders, s_orders, f_orders, fee, xrate=args.xrate
+        args.token_pair, accounts, b_orders, s_orders, f_orders, fee, xrate=args.xrate,
+        deadline=deadline
     )
 
+    if deadline.is_expired():
+        logger.warning("Time limit reached.")
+
+    return orders, prices, fee
+
+
+def main(args):
+    start_time = time.time()
+
+    # Load dict from json.
+    instance = json.load(args.instance, parse_float=D)
+
+    orders, prices, fee = solve_instance(instance, args, start_time)
+
     runtime = time.time() - start_time
     stats = Stats(runtime=runtime, exit_status="completed")
 
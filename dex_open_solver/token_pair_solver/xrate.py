@@ -12,29 +12,39 @@ See https://github.com/gnosis/dex-open-solver/blob/master/doc/token_pair/token_p
 """
 
 import logging
-from collections import deque, namedtuple
+from bisect import bisect_left
+from collections import namedtuple
 from fractions import Fraction as F
-from functools import lru_cache
+from heapq import merge
 from itertools import groupby
-from math import sqrt, log, ceil
+from math import sqrt
+from operator import itemgetter
 
 from ..core.config import Config
+from ..core.util import is_expired
 
-from .amount import compute_buy_amounts
-from .orderbook import compute_objective_rational, prune_unrealizable_orders
+from .amount import MIN_TRADABLE_AMOUNT, compute_buy_amounts
+from .orderbook import (PairOrderBook, compute_objective_rational,
+                        prune_unrealizable_pair_orders)
+from .screening import ApproxObjective
 
 logger = logging.getLogger(__name__)
 
 
-IntervalData = namedtuple('IntervalData', ['xrate', 'orders', 'partial'])
+IntervalData = namedtuple(
+    'IntervalData', ['xrate', 'columns', 'nr_exec_orders', 'partial']
+)
 
 
 # Generate the b_order indexes that needs to execute to satisfy current
 # given s_sell_amount and xrate intervals, and the equation:
 # xrate = b_sell_amount / (s_sell_amount * (1 - fee))
 # <=> b_sell_amount = s_sell_amount * xrate * (1 - fee).
+# The indexes are into the b_orders columns (and less than nr_b_exec_orders),
+# in decreasing order.
 def xrate_interval_iterator_b_orders(
     b_orders,
+    nr_b_exec_orders,
     s_sell_amount_lb,
     s_sell_amount_ub,
     xrate_lb,
@@ -44,23 +54,20 @@ def xrate_interval_iterator_b_orders(
     b_sell_amount_lb = s_sell_amount_lb * xrate_lb * (1 - fee.value)
     b_sell_amount_ub = s_sell_amount_ub * xrate_ub * (1 - fee.value)
 
-    cur_b_sell_amount_ub = sum(b_order.max_sell_amount for b_order in b_orders)
-    for i in range(len(b_orders)):
-        cur_b_sell_amount_lb = cur_b_sell_amount_ub \
-            - b_orders[i].max_sell_amount
-        if cur_b_sell_amount_ub < b_sell_amount_lb:
-            break
-        if cur_b_sell_amount_lb <= b_sell_amount_ub:
-            yield i
-        cur_b_sell_amount_ub -= b_orders[i].max_sell_amount
+    yield from reversed(b_orders.partially_executable_range(
+        nr_b_exec_orders, b_sell_amount_lb, b_sell_amount_ub
+    ))
 
 
 # Generate the s_order indexes that needs to execute to satisfy current
 # given b_sell_amount and xrate intervals, and the equation:
 # xrate = b_sell_amount / (s_sell_amount * (1 - fee))
 # <=> s_sell_amount = b_sell_amount / (xrate * (1 - fee)).
+# The indexes are into the s_orders columns (and less than nr_s_exec_orders),
+# in decreasing order.
 def xrate_interval_iterator_s_orders(
     s_orders,
+    nr_s_exec_orders,
     b_sell_amount_lb,
     b_sell_amount_ub,
     xrate_lb,
@@ -70,18 +77,12 @@ def xrate_interval_iterator_s_orders(
     s_sell_amount_lb = b_sell_amount_lb / (xrate_ub * (1 - fee.value))
     s_sell_amount_ub = b_sell_amount_ub / (xrate_lb * (1 - fee.value))
 
-    cur_s_sell_amount_ub = sum(s_order.max_sell_amount for s_order in s_orders)
-    for i in range(len(s_orders)):
-        cur_s_sell_amount_lb = cur_s_sell_amount_ub \
-            - s_orders[i].max_sell_amount
-        if cur_s_sell_amount_ub < s_sell_amount_lb:
-            break
-        if cur_s_sell_amount_lb <= s_sell_amount_ub:
-            yield i
-        cur_s_sell_amount_ub -= s_orders[i].max_sell_amount
+    yield from reversed(s_orders.partially_executable_range(
+        nr_s_exec_orders, s_sell_amount_lb, s_sell_amount_ub
+    ))
 
 
-def xrate_interval_iterator(b_orders, s_orders, fee, optimal_trivial_xrate=None):
+def xrate_interval_iterator(order_book, fee, optimal_trivial_xrate=None):
     """Exchange rate interval iterator.
 
     Iterates through intervals [xrate_lb, xrate_ub] of possible values for xrate,
@@ -89,168 +90,200 @@ def xrate_interval_iterator(b_orders, s_orders, fee, optimal_trivial_xrate=None)
     consecutive in the optimal execution order.
 
     At each iteration yields an IntervalData object containing the xrate interval,
-    two sorted lists: b_exec_orders and s_exec_orders, which can be executed
-    if xrate is in the given interval, and a pair of indexes into the exec order lists
-    pointing to the first partially executed order in each corresponding list.
+    the b_orders and s_orders columns, the number of (leading) orders in each
+    of them which can be executed if xrate is in the given interval, and a pair
+    of indexes into the columns pointing to the partially executed order in each
+    of them. The columns are shared by all IntervalData objects, i.e. no orders
+    are copied.
 
     Skips some suboptimal intervals.
     """
+    b_orders, s_orders = order_book.b_orders, order_book.s_orders
     assert len(b_orders) > 0 and len(s_orders) > 0
     B, S = 0, 1
 
-    # Collect b_orders and s_orders in a single list sorted by optimal execution order.
-    OrderVariant = namedtuple('OrderInfo', ['type', 'xrate', 'data'])
+    # Merge b_orders and s_orders in a single list sorted by optimal execution order.
+    # Since b_orders and s_orders are sorted by decreasing max_xrate, this is a
+    # merge of the b_orders (by decreasing xrate) and the s_orders in reverse
+    # (by decreasing 1 / xrate).
     f = 1 - fee.value
-    all_orders = [
-        OrderVariant(B, b_order.max_xrate * f, b_order)
-        for b_order in b_orders
-    ] + [
-        OrderVariant(S, 1 / (s_order.max_xrate * f), s_order)
-        for s_order in s_orders
-    ]
-
-    all_orders = sorted(all_orders, key=lambda order: order.xrate, reverse=True)
+    all_xrates = list(merge(
+        [(B, b_max_xrate * f) for b_max_xrate in b_orders.max_xrates],
+        [(S, 1 / (s_max_xrate * f)) for s_max_xrate in reversed(s_orders.max_xrates)],
+        key=itemgetter(1),
+        reverse=True
+    ))
 
     # Loop through all possible intervals for xrate, ordered from highest to lowest.
 
-    # The list of b_orders which can be executed if xrate is in the current interval,
-    # initially empty.
-    b_exec_orders = deque()
-
-    # The list of s_orders which can be executed if xrate is in the current interval,
-    # initially holding all s_orders.
-    s_exec_orders = deque([order.data for order in all_orders if order.type == S])
-
-    # Total sell amount of b_orders in the b_exec_orders list.
-    b_exec_sell_amount_ub = 0
+    # The b_orders which can be executed if xrate is in the current interval
+    # are the first nr_b_exec_orders b_orders, initially none.
+    nr_b_exec_orders = 0
 
-    # Total sell amount of s_orders in the s_exec_orders list.
-    s_exec_sell_amount_ub = sum(s_order.max_sell_amount for s_order in s_orders)
+    # The s_orders which can be executed if xrate is in the current interval
+    # are the first nr_s_exec_orders s_orders, initially all.
+    nr_s_exec_orders = len(s_orders)
 
     # Main loop.
-    for order_i in range(len(all_orders) - 1):
-        order_type, order_xrate, order = all_orders[order_i]
-        next_order_xrate = all_orders[order_i + 1].xrate
+    for order_i in range(len(all_xrates) - 1):
+        order_type, order_xrate = all_xrates[order_i]
+        next_order_xrate = all_xrates[order_i + 1][1]
 
-        # Update exec_orders / exec_sell_amounts.
+        # Update nr_exec_orders.
         if order_type == B:
-            b_exec_orders.appendleft(order)
-            b_exec_sell_amount_ub += order.max_sell_amount
+            nr_b_exec_orders += 1
 
         if order_type == S:
-            s_exec_orders.popleft()
-            s_exec_sell_amount_ub -= order.max_sell_amount
+            nr_s_exec_orders -= 1
 
         # If optimal_trivial_xrate is given, then consider only xrate intervals for
         # which optimal_trivial_xrate is an endpoint.
         if optimal_trivial_xrate is not None:
             test_xrates = {order_xrate, next_order_xrate}
             if order_i > 0:
-                prev_order_xrate = all_orders[order_i - 1].xrate
+                prev_order_xrate = all_xrates[order_i - 1][1]
                 test_xrates.add(prev_order_xrate)
             if optimal_trivial_xrate not in test_xrates:
                 continue
 
         # If no b_order was yet visited, there can't be a match => go to next order.
-        if len(b_exec_orders) == 0:
+        if nr_b_exec_orders == 0:
             continue
 
         # If there are no more s_orders below current xrate interval, then there can't
         # be no more matches => exit iteration.
-        if len(s_exec_orders) == 0:
+        if nr_s_exec_orders == 0:
             return
 
         # xrate interval associated with this iteration.
         xrate_lb = next_order_xrate
         xrate_ub = order_xrate
 
-        # lb(exec_sell_amount) is the sold amount of all executed orders, except the
-        # last one, which potentially may be only partially executed.
-        b_exec_sell_amount_lb = b_exec_sell_amount_ub - b_exec_orders[0].max_sell_amount
-        s_exec_sell_amount_lb = s_exec_sell_amount_ub - s_exec_orders[0].max_sell_amount
+        # ub(exec_sell_amount) is the sold amount of all executed orders, and
+        # lb(exec_sell_amount) of all except the last one, which potentially may be
+        # only partially executed.
+        b_exec_sell_amount_ub = b_orders.sum_max_sell_amounts(0, nr_b_exec_orders)
+        s_exec_sell_amount_ub = s_orders.sum_max_sell_amounts(0, nr_s_exec_orders)
+        b_exec_sell_amount_lb = b_orders.sum_max_sell_amounts(0, nr_b_exec_orders - 1)
+        s_exec_sell_amount_lb = s_orders.sum_max_sell_amounts(0, nr_s_exec_orders - 1)
 
-        # yield fixed set of s_exec_orders and distinct sets b_exec_orders
+        # yield fixed set of s_exec_orders (with the last one partially executed)
+        # and distinct sets b_exec_orders
         for i in xrate_interval_iterator_b_orders(
-            b_exec_orders,
+            b_orders, nr_b_exec_orders,
             s_exec_sell_amount_lb, s_exec_sell_amount_ub,
             xrate_lb, xrate_ub,
             fee
         ):
             yield IntervalData(
                 xrate=(xrate_lb, xrate_ub),
-                orders=(list(b_exec_orders), list(s_exec_orders)),
-                partial=(i, 0)
+                columns=(b_orders, s_orders),
+                nr_exec_orders=(nr_b_exec_orders, nr_s_exec_orders),
+                partial=(i, nr_s_exec_orders - 1)
             )
 
-        # yield fixed set of b_exec_orders and distinct sets s_exec_orders
+        # yield fixed set of b_exec_orders (with the last one partially executed)
+        # and distinct sets s_exec_orders
         for i in xrate_interval_iterator_s_orders(
-            s_exec_orders,
+            s_orders, nr_s_exec_orders,
             b_exec_sell_amount_lb, b_exec_sell_amount_ub,
             xrate_lb, xrate_ub,
             fee
         ):
             yield IntervalData(
                 xrate=(xrate_lb, xrate_ub),
-                orders=(list(b_exec_orders), list(s_exec_orders)),
-                partial=(0, i)
+                columns=(b_orders, s_orders),
+                nr_exec_orders=(nr_b_exec_orders, nr_s_exec_orders),
+                partial=(nr_b_exec_orders - 1, i)
             )
 
 
+def snap_xrate(xrate, xrate_lb, xrate_ub, max_denominator):
+    """Return the closest xrate to the given one with denominator at most
+    max_denominator, if it is still within ]xrate_lb, xrate_ub[, or the given
+    xrate otherwise."""
+    snapped_xrate = xrate.limit_denominator(max_denominator)
+    if xrate_lb < snapped_xrate < xrate_ub:
+        return snapped_xrate
+    return xrate
+
+
+class XrateSearchCache:
+    """Memo of the objective values computed by a previous xrate search, to be
+    reused by the next search on almost the same orders (e.g. after removing an
+    order).
+
+    The objective at an xrate only depends on the orders executable at that xrate,
+    i.e. on prefixes of the b_orders and s_orders columns. It can be reused as long
+    as these prefixes did not change.
+
+    This only memoizes objectives: every search still builds its own columns and
+    intervals, and evaluates all candidate xrates (from the memo where possible),
+    i.e. it does not start from the optimum of the previous search.
+    """
+
+    def __init__(self):
+        self.columns = None
+        # Maps xrates to (nr_exec_orders, objective) pairs.
+        self.objectives = {}
+
+
 class SymbolicSolver:
     Constants = namedtuple(
         'Constants',
         ['b_pi', 'b_yb', 'b_yb_F', 's_pi', 's_yb', 's_yb_F', 'c', 'f']
     )
 
-    def __init__(self, fee):
+    def __init__(
+        self, fee, deadline=None, screening=None, xrate_max_denominator=None,
+        cache=None
+    ):
         self.fee = fee
-
-    # Iterates through the set of unfilled orders.
-    def orders_U(self, orders, partial_idx):
-        yield from orders[:partial_idx]
-
-    # Iterates through the set of completely filled orders.
-    def orders_F(self, orders, partial_idx):
-        yield from orders[(partial_idx + 1):]
-
-    # Total sell amount of completely filled orders.
-    def sum_yb_F(self, orders, partial_idx):
-        return sum(
-            order.max_sell_amount
-            for order in self.orders_F(orders, partial_idx)
-        )
-
-    # Constant c - see "Local optima for a given interval" in the documentation.
-    def c_constant(self, b_orders, b_partial_idx, s_orders, s_partial_idx):
-        b_sum_yb_F, b_sum_yb_U = (
-            sum(
-                o.max_sell_amount for o in fn(b_orders, b_partial_idx)
-            ) for fn in (self.orders_F, self.orders_U)
-        )
-        s_sum_ybpi_F, s_sum_ybpi_U = (
-            sum(
-                o.max_sell_amount / o.max_xrate for o in fn(s_orders, s_partial_idx)
-            ) for fn in (self.orders_F, self.orders_U)
-        )
-        f = 1 - self.fee.value
-        return f * (b_sum_yb_F - b_sum_yb_U) - s_sum_ybpi_F + s_sum_ybpi_U
-
+        self.deadline = deadline
+        # If given, objectives computed by the previous search are reused where
+        # possible, and the ones computed by this search are stored.
+        self.cache = cache
+        self.cached_objectives = {}
+        self.nr_common_orders = (0, 0)
+        # If screening is enabled, objectives are first approximated in floating
+        # point arithmetic, and only computed exactly where the approximation
+        # can't tell candidate xrates apart (see screening.py).
+        if screening is None:
+            screening = Config.XRATE_SEARCH_SCREENING
+        self.screening = screening
+        # If given, candidate xrates within intervals are snapped to the closest
+        # xrate with at most this denominator, which keeps the rational
+        # arithmetic on them cheap (at the cost of slightly suboptimal xrates).
+        if xrate_max_denominator is None:
+            xrate_max_denominator = Config.XRATE_MAX_DENOMINATOR
+        self.xrate_max_denominator = xrate_max_denominator
+
+    # Constants for a given interval - see "Local optima for a given interval" in
+    # the documentation. Computed in O(1) from the prefix sums of the columns.
     def compute_constants(self, interval_data):
-        b_orders, s_orders = interval_data.orders
-        b_partial_idx, s_partial_idx = interval_data.partial
+        b_orders, s_orders = interval_data.columns
+        nr_b_exec_orders, nr_s_exec_orders = interval_data.nr_exec_orders
+        # Index of the partially filled order in the columns. The completely
+        # filled orders are the ones before it, and the unfilled orders the ones
+        # after it (up to nr_exec_orders).
+        b_i, s_i = interval_data.partial
 
-        b_pi = b_orders[b_partial_idx].max_xrate
-        s_pi = s_orders[s_partial_idx].max_xrate
+        b_pi = b_orders.max_xrates[b_i]
+        s_pi = s_orders.max_xrates[s_i]
 
-        b_yb = b_orders[b_partial_idx].max_sell_amount
-        s_yb = s_orders[s_partial_idx].max_sell_amount
+        b_yb = b_orders.max_sell_amounts[b_i]
+        s_yb = s_orders.max_sell_amounts[s_i]
 
-        b_yb_F = self.sum_yb_F(b_orders, b_partial_idx)
-        s_yb_F = self.sum_yb_F(s_orders, s_partial_idx)
+        b_yb_F = b_orders.sum_max_sell_amounts(0, b_i)
+        s_yb_F = s_orders.sum_max_sell_amounts(0, s_i)
 
-        c = self.c_constant(b_orders, b_partial_idx, s_orders, s_partial_idx)
         f = 1 - self.fee.value
 
+        b_yb_U = b_orders.sum_max_sell_amounts(b_i + 1, nr_b_exec_orders)
+        s_ybpi_F = s_orders.sum_min_buy_amounts(0, s_i)
+        s_ybpi_U = s_orders.sum_min_buy_amounts(s_i + 1, nr_s_exec_orders)
+        c = f * (b_yb_F - b_yb_U) - s_ybpi_F + s_ybpi_U
+
         return self.Constants(
             b_pi=b_pi, b_yb=b_yb, b_yb_F=b_yb_F,
             s_pi=s_pi, s_yb=s_yb, s_yb_F=s_yb_F,
@@ -310,9 +343,10 @@ class SymbolicSolver:
         return r
 
     # Computes objective value from order execution via `compute_buy_amounts`.
+    # b_orders and s_orders must be sorted by execution priority.
     def compute_objective(self, xrate, b_orders, s_orders):
         compute_buy_amounts(
-            xrate, b_orders, s_orders, fee=self.fee
+            xrate, b_orders, s_orders, fee=self.fee, presorted=True
         )
         return compute_objective_rational(
             b_orders=b_orders, s_orders=s_orders, f_orders=[],
@@ -321,6 +355,258 @@ class SymbolicSolver:
             fee=self.fee
         )
 
+    # Compare the given order book with the one of the previous search (see
+    # XrateSearchCache), to find out which of its objectives can be reused.
+    def load_cache(self, order_book):
+        if self.cache is None:
+            return
+        columns = (order_book.b_orders, order_book.s_orders)
+        if self.cache.columns is not None:
+            self.cached_objectives = self.cache.objectives
+            self.nr_common_orders = tuple(
+                cached_orders.count_common_leading_orders(orders)
+                for cached_orders, orders in zip(self.cache.columns, columns)
+            )
+        self.cache.columns = columns
+        self.cache.objectives = {}
+
+    # Same as `compute_objective_from_columns`, but reuses the objective computed
+    # at the same xrate by the previous search if the executable orders are the
+    # same, i.e. the same number of them and within the common leading orders.
+    def compute_objective_from_columns_cached(
+        self, xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+    ):
+        if self.cache is None:
+            return self.compute_objective_from_columns(
+                xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+            )
+        nr_exec_orders = (nr_b_exec_orders, nr_s_exec_orders)
+        cached = self.cached_objectives.get(xrate)
+        if cached is not None and cached[0] == nr_exec_orders \
+                and nr_b_exec_orders <= self.nr_common_orders[0] \
+                and nr_s_exec_orders <= self.nr_common_orders[1]:
+            obj = cached[1]
+        else:
+            obj = self.compute_objective_from_columns(
+                xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+            )
+        self.cache.objectives[xrate] = (nr_exec_orders, obj)
+        return obj
+
+    # Computes the objective value (as `compute_objective`) at an xrate where the
+    # executable orders are the first nr_b_exec_orders b_orders and the first
+    # nr_s_exec_orders s_orders (columns), from their prefix sums.
+    # Since only a bounded number of orders can be executed, this takes
+    # O(MAX_NR_EXEC_ORDERS) operations, or O(log(n)) if neither the minimum
+    # tradable amount nor the maximum number of executed orders constraints are
+    # binding, in which case the objective is computed in closed form.
+    def compute_objective_from_columns(
+        self, xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+    ):
+        f = 1 - self.fee.value
+
+        # Without side constraints, orders are executed in order on each side
+        # until the traded volume (in s_buy_token) is exhausted on one of them.
+        volume = min(
+            b_orders.sum_max_sell_amounts(0, nr_b_exec_orders),
+            s_orders.sum_max_sell_amounts(0, nr_s_exec_orders) * xrate * f
+        )
+        nr_b_filled_orders, b_partial_sell_amount = \
+            b_orders.count_orders_executable_with_sell_amount(nr_b_exec_orders, volume)
+        nr_s_filled_orders, s_partial_sell_amount = \
+            s_orders.count_orders_executable_with_sell_amount(
+                nr_s_exec_orders, volume / (xrate * f)
+            )
+
+        # Check that no side constraint is binding (if there is a match).
+        if volume > 0:
+            nr_exec_orders = nr_b_filled_orders + nr_s_filled_orders \
+                + (b_partial_sell_amount > 0) + (s_partial_sell_amount > 0)
+            if nr_exec_orders > Config.MAX_NR_EXEC_ORDERS:
+                return self.compute_objective_by_bounded_execution(
+                    xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+                )
+            b_min_sell_amount = b_orders.min_max_sell_amount(nr_b_exec_orders)
+            s_min_sell_amount = s_orders.min_max_sell_amount(nr_s_exec_orders)
+            if b_partial_sell_amount > 0:
+                b_min_sell_amount = min(b_min_sell_amount, b_partial_sell_amount)
+            if s_partial_sell_amount > 0:
+                s_min_sell_amount = min(s_min_sell_amount, s_partial_sell_amount)
+            if min(
+                b_min_sell_amount, b_min_sell_amount * f / xrate,
+                s_min_sell_amount, s_min_sell_amount * xrate * f
+            ) < MIN_TRADABLE_AMOUNT:
+                return self.compute_objective_by_bounded_execution(
+                    xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+                )
+
+        # The 2u-umax term of a b_order selling yb with limit xrate pi is
+        # (2yb - yb_max)(f / xrate - 1 / pi), and of an s_order
+        # (2yb - yb_max)(f - 1 / (xrate * pi)) (since b_buy_token_price=1).
+        # Hence completely filled orders contribute umax, unfilled ones -umax.
+        def filled_minus_unfilled_sums(orders, nr_filled_orders, partial, nr_exec_orders):
+            start_U = nr_filled_orders + (partial > 0)
+            return (
+                orders.sum_max_sell_amounts(0, nr_filled_orders)
+                - orders.sum_max_sell_amounts(start_U, nr_exec_orders),
+                orders.sum_min_buy_amounts(0, nr_filled_orders)
+                - orders.sum_min_buy_amounts(start_U, nr_exec_orders)
+            )
+
+        b_yb, b_ybpi = filled_minus_unfilled_sums(
+            b_orders, nr_b_filled_orders, b_partial_sell_amount, nr_b_exec_orders
+        )
+        s_yb, s_ybpi = filled_minus_unfilled_sums(
+            s_orders, nr_s_filled_orders, s_partial_sell_amount, nr_s_exec_orders
+        )
+        objective = f / xrate * b_yb - b_ybpi + f * s_yb - s_ybpi / xrate
+
+        if b_partial_sell_amount > 0:
+            i = nr_b_filled_orders
+            objective += (2 * b_partial_sell_amount - b_orders.max_sell_amounts[i]) \
+                * (f / xrate - 1 / b_orders.max_xrates[i])
+        if s_partial_sell_amount > 0:
+            i = nr_s_filled_orders
+            objective += (2 * s_partial_sell_amount - s_orders.max_sell_amounts[i]) \
+                * (f - 1 / (xrate * s_orders.max_xrates[i]))
+
+        # Half of the fees, i.e. of the imbalance of b_buy_token (in fee token).
+        b_buy_token_imbalance = volume / (xrate * f) - volume * f / xrate
+        return objective + b_buy_token_imbalance / F(Config.FEE_TOKEN_PRICE) / 2
+
+    # Same as `compute_objective_from_columns`, when side constraints are binding.
+    # Replays the execution of `compute_buy_amounts` in terms of the traded
+    # volume (in s_buy_token), where a b_order can trade up to its max_sell_amount
+    # and an s_order up to its max_sell_amount * xrate * (1 - fee). Only the first
+    # MAX_NR_EXEC_ORDERS executable orders on each side satisfying the minimum
+    # tradable amount can be executed, so this takes O(MAX_NR_EXEC_ORDERS)
+    # operations (plus the number of orders skipped for the minimum tradable
+    # amount).
+    def compute_objective_by_bounded_execution(
+        self, xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+    ):
+        f = 1 - self.fee.value
+
+        # Returns the column indexes of the tradable orders, the traded volume
+        # before each of them (and after the last one), and the column indexes
+        # of the skipped orders.
+        def tradable_orders(orders, nr_exec_orders, min_sell_amount, volume_factor):
+            indexes, skipped_indexes = [], []
+            sell_amount_sum = 0
+            volumes = [0]
+            # Compare in integer arithmetic (most sell amounts are integers).
+            min_sell_amount = F(min_sell_amount)
+            n, d = min_sell_amount.numerator, min_sell_amount.denominator
+            for i in range(nr_exec_orders):
+                if len(indexes) == Config.MAX_NR_EXEC_ORDERS:
+                    break
+                sell_amount = orders.max_sell_amounts[i]
+                if sell_amount * d >= n:
+                    indexes.append(i)
+                    sell_amount_sum += sell_amount
+                    volumes.append(sell_amount_sum * volume_factor)
+                else:
+                    skipped_indexes.append(i)
+            return indexes, volumes, skipped_indexes
+
+        # The min tradable amount constraint on the buy amount, in terms of the
+        # sell amount (see filter_orders_violating_min_tradable_amount).
+        b_indexes, b_volumes, b_skipped_indexes = tradable_orders(
+            b_orders, nr_b_exec_orders,
+            max(MIN_TRADABLE_AMOUNT, MIN_TRADABLE_AMOUNT * xrate / f), 1
+        )
+        s_indexes, s_volumes, s_skipped_indexes = tradable_orders(
+            s_orders, nr_s_exec_orders,
+            max(MIN_TRADABLE_AMOUNT, MIN_TRADABLE_AMOUNT / (xrate * f)), xrate * f
+        )
+
+        # Execute matching orders, bounded by the max_nr_exec_orders constraint.
+        # b_i and s_i are the number of completely filled orders.
+        volume = 0
+        b_i, s_i = 0, 0
+        while b_i < len(b_indexes) and s_i < len(s_indexes) \
+                and b_i + s_i < Config.MAX_NR_EXEC_ORDERS:
+            volume = min(b_volumes[b_i + 1], s_volumes[s_i + 1])
+            b_i += b_volumes[b_i + 1] == volume
+            s_i += s_volumes[s_i + 1] == volume
+
+        # Point b_i, s_i to the last executed orders.
+        def last_executed_order(volumes, volume):
+            return bisect_left(volumes, volume) - 1
+
+        b_i = last_executed_order(b_volumes, volume)
+        s_i = last_executed_order(s_volumes, volume)
+
+        # Undo the last executed pair if the max_nr_exec_orders constraint is
+        # exceeded, i.e. the volume of the smallest of them.
+        if b_i + s_i + 2 > Config.MAX_NR_EXEC_ORDERS:
+            volume = max(b_volumes[b_i], s_volumes[s_i])
+            b_i = last_executed_order(b_volumes, volume)
+            s_i = last_executed_order(s_volumes, volume)
+
+        # Undo the last executed orders while they violate the min tradable amount.
+        undone_order_execution = True
+        while undone_order_execution and b_i >= 0:
+            undone_order_execution = False
+            # The volume of a b_order is its sell amount.
+            b_sell_amount = volume - b_volumes[b_i]
+            if min(b_sell_amount, b_sell_amount * f / xrate) < MIN_TRADABLE_AMOUNT:
+                volume = b_volumes[b_i]
+                b_i -= 1
+                s_i = last_executed_order(s_volumes, volume)
+                undone_order_execution = True
+            if s_i < 0:
+                break
+            # The volume of an s_order is its buy amount.
+            s_buy_amount = volume - s_volumes[s_i]
+            if min(s_buy_amount, s_buy_amount / (xrate * f)) < MIN_TRADABLE_AMOUNT:
+                volume = s_volumes[s_i]
+                s_i -= 1
+                b_i = last_executed_order(b_volumes, volume)
+                undone_order_execution = True
+
+        # Total min buy amount of the executed orders (weighted by the executed
+        # fraction), i.e. of the first i tradable orders plus the partially
+        # executed one. Computed from the prefix sums of all orders up to the
+        # latter, unless more orders were skipped than executed.
+        def sum_exec_min_buy_amounts(orders, indexes, i, sell_amount, skipped_indexes):
+            if i < 0:
+                return 0
+            stop = indexes[i]
+            nr_skipped_orders = stop - i
+            if nr_skipped_orders < i:
+                s = orders.sum_min_buy_amounts(0, stop) - sum(
+                    orders.sum_min_buy_amounts(j, j + 1)
+                    for j in skipped_indexes[:nr_skipped_orders]
+                )
+            else:
+                s = sum(orders.sum_min_buy_amounts(j, j + 1) for j in indexes[:i])
+            return s + sell_amount / orders.max_xrates[stop]
+
+        b_ybpi = sum_exec_min_buy_amounts(
+            b_orders, b_indexes, b_i,
+            volume - b_volumes[b_i] if b_i >= 0 else 0,
+            b_skipped_indexes
+        )
+        s_ybpi = sum_exec_min_buy_amounts(
+            s_orders, s_indexes, s_i,
+            (volume - s_volumes[s_i]) / (xrate * f) if s_i >= 0 else 0,
+            s_skipped_indexes
+        )
+
+        # 2u for the executed orders, i.e. the traded volume is the total sell
+        # amount of the b_orders, and volume / (xrate * f) of the s_orders.
+        u = f / xrate * volume - b_ybpi + volume / xrate - s_ybpi / xrate
+
+        # umax of all executable orders (see compute_objective_from_columns).
+        umax = f / xrate * b_orders.sum_max_sell_amounts(0, nr_b_exec_orders) \
+            - b_orders.sum_min_buy_amounts(0, nr_b_exec_orders) \
+            + f * s_orders.sum_max_sell_amounts(0, nr_s_exec_orders) \
+            - s_orders.sum_min_buy_amounts(0, nr_s_exec_orders) / xrate
+
+        b_buy_token_imbalance = volume / (xrate * f) - volume * f / xrate
+        return 2 * u - umax + b_buy_token_imbalance / F(Config.FEE_TOKEN_PRICE) / 2
+
     # Collect the local optima that lie strictly within the given interval.
     # Also returns the id (3-5) of the root for debugging purposes
     def collect_local_optima_within_interval(self, interval_data):
@@ -334,6 +620,11 @@ class SymbolicSolver:
             (xrate, i + 2) for i, xrate in enumerate(xrates)
             if xrate is not None and xrate > xrate_lb and xrate < xrate_ub
         ]
+        if self.xrate_max_denominator is not None:
+            xrates = [
+                (snap_xrate(xrate, xrate_lb, xrate_ub, self.xrate_max_denominator), i)
+                for xrate, i in xrates
+            ]
         # aggregate by root value
         xrates = sorted(xrates, key=lambda xi: xi[0])
         xrates = [
@@ -342,37 +633,36 @@ class SymbolicSolver:
         ]
         return xrates
 
-    # Compute the optimal xrate in the interval ]xrate_lb, xrate_ub[.
-    def solve_interval(self, interval_data):
+    # Collect the candidate xrates in the interval ]xrate_lb, xrate_ub[, as
+    # (xrate, root_ids, nr_exec_orders) tuples.
+    def collect_interval_candidates(self, interval_data):
         xrates = self.collect_local_optima_within_interval(interval_data)
-
-        xrate_lb, xrate_ub = interval_data.xrate
-        b_orders, s_orders = interval_data.orders
-
-        if len(xrates) == 0:
-            return (None, None)
-
-        xrates_obj = [
-            (
-                xrate,
-                root_ids,
-                self.compute_objective(xrate, b_orders, s_orders)
-            ) for xrate, root_ids in xrates
+        return [
+            (xrate, root_ids, interval_data.nr_exec_orders)
+            for xrate, root_ids in xrates
         ]
 
-        opt = max(xrates_obj, key=lambda xio: xio[2])
-
-        logger.debug(
-            "Exchange rate candidates in interval xrate \u2208 [%s, %s]:",
-            xrate_lb, xrate_ub
-        )
-        for xrate, root_ids, obj in xrates_obj:
-            logger.debug(
-                "\troots%s : (%s, %s)\t" + ("[local optimum]" if obj == opt[2] else ""),
-                root_ids, xrate, obj
-            )
-
-        return (opt[0], opt[2])
+    # Select the candidates ((xrate, root_ids, nr_exec_orders) tuples) that may
+    # be optimal given their approximate objective values, i.e. all except those
+    # whose objective is certainly lower than lb (an exact objective, if given),
+    # or than the objective of another candidate.
+    def screen_candidates(self, candidates, lb, approx_objective):
+        approx_objs = [
+            approx_objective(xrate, *nr_exec_orders)
+            for xrate, _, nr_exec_orders in candidates
+        ]
+        lbs = [obj - error for obj, error in filter(None, approx_objs)]
+        if lb is not None:
+            try:
+                lbs.append(float(lb))
+            except OverflowError:
+                pass
+        lb = max(lbs, default=float('-inf'))
+        return [
+            candidate
+            for candidate, approx_obj in zip(candidates, approx_objs)
+            if approx_obj is None or approx_obj[0] + approx_obj[1] >= lb
+        ]
 
     # Collect the local optima in case there is no match.
     # Also returns the id (1-2) of the root for debugging purposes
@@ -396,83 +686,127 @@ class SymbolicSolver:
         ]
         return xrates
 
-    # The objective function is non-deferentiable but has only one
-    # local optimum. It's semi-derivative has only one zero, which
-    # can be found in O(log2(n)) steps using binary search.
-    def solve_trivial_bin_search(self, xrates, b_orders, s_orders):
-
-        # Remove duplicates and sort.
-        xrates = sorted(list(set(xrates)))
-
-        # Memoizing this function saves a few computations,
-        # since the code below may evaluate the objective on the
-        # same point multiple times.
-        @lru_cache(maxsize=ceil(log(len(xrates))))
-        def f(xrate):
-            return self.compute_objective(xrate, b_orders, s_orders)
-
+    # Evaluates the objective at all the given (sorted) xrates, with a single
+    # sweep that keeps track of the executable orders at each xrate (see
+    # compute_objective_from_columns). Returns the list of objectives.
+    def compute_objectives_by_sweep(self, xrates, order_book):
+        b_orders, s_orders = order_book.b_orders, order_book.s_orders
+        f = 1 - self.fee.value
+        b_limit_xrates = [b_max_xrate * f for b_max_xrate in b_orders.max_xrates]
+        s_limit_xrates = [s_max_xrate * f for s_max_xrate in s_orders.max_xrates]
+
+        # As xrate increases, b_orders stop being executable, and s_orders
+        # become executable, in execution order.
+        nr_b_exec_orders = len(b_orders)
+        nr_s_exec_orders = 0
+        objs = []
+        for xrate in xrates:
+            while nr_b_exec_orders > 0 \
+                    and b_limit_xrates[nr_b_exec_orders - 1] < xrate:
+                nr_b_exec_orders -= 1
+            while nr_s_exec_orders < len(s_orders) \
+                    and s_limit_xrates[nr_s_exec_orders] >= 1 / xrate:
+                nr_s_exec_orders += 1
+            objs.append(self.compute_objective_from_columns_cached(
+                xrate, b_orders, s_orders, nr_b_exec_orders, nr_s_exec_orders
+            ))
+        return objs
+
+    # Binary search on the semi-derivative of the objective over the (sorted)
+    # trivial solution xrates, given their objectives. Returns an index into objs.
+    # The objective is not necessarily unimodal over these xrates, in which case
+    # this returns a local optimum.
+    def solve_trivial_bin_search(self, objs):
         # If the least as at most 2 elements, there's no need for binary search.
-        if len(xrates) <= 2:
-            xrate = max(xrates, key=f)
-            return xrate, f(xrate)
+        if len(objs) <= 2:
+            return max(range(len(objs)), key=lambda i: objs[i])
 
         # Case where the optimal is the leftmost element.
-        if f(xrates[0]) > f(xrates[1]):
-            return xrates[0], f(xrates[0])
+        if objs[0] > objs[1]:
+            return 0
 
         # Case where the optimal is the rightmost element.
-        if f(xrates[-1]) > f(xrates[-2]):
-            return xrates[-1], f(xrates[-1])
+        if objs[-1] > objs[-2]:
+            return len(objs) - 1
 
-        # binary search on the semi-derivative of f(xrate)
         left = 1
-        right = len(xrates) - 1
+        right = len(objs) - 1
         center = (left + right) // 2
         while left != center and right != center:
-            d_left = f(xrates[left]) - f(xrates[left - 1])
-            d_right = f(xrates[right]) - f(xrates[right - 1])
-            d_center = f(xrates[center]) - f(xrates[center - 1])
+            d_left = objs[left] - objs[left - 1]
+            d_center = objs[center] - objs[center - 1]
             if d_left * d_center > 0:
-                assert d_left > 0
                 left = center
             else:
-                assert d_right < 0
-                assert d_center < 0
                 right = center
             center = (left + right) // 2
 
-        return xrates[center], f(xrates[center])
+        return center
 
     # Compute the optimal xrate for the trivial solution (zero buy/sell amounts).
-    def solve_trivial(self, b_orders, s_orders):
-        xrates = self.collect_local_optima_for_trivial_solution(b_orders, s_orders)
+    def solve_trivial(self, order_book):
+        xrates = self.collect_local_optima_for_trivial_solution(
+            order_book.b_orders, order_book.s_orders
+        )
 
         if len(xrates) == 0:
-            return (None, None)
+            return None, None
 
         # Ignore root_ids.
         xrates = [xrate for xrate, root_ids in xrates]
-        xrate, obj = self.solve_trivial_bin_search(xrates, b_orders, s_orders)
-
-        return xrate, obj
-
-    def solve(self, b_orders, s_orders):
-        b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, self.fee)
+        objs = self.compute_objectives_by_sweep(xrates, order_book)
+
+        # All objectives are known, but the xrate is still selected by binary
+        # search (a local optimum, not necessarily the maximum of objs): it seeds
+        # the interval search, and a different seed changes the solutions found
+        # (see has-non-trival-solution/has_expected_objective_test.py).
+        i = self.solve_trivial_bin_search(objs)
+        return xrates[i], objs[i]
+
+    def solve(self, b_orders, s_orders, presorted=False):
+        order_book = prune_unrealizable_pair_orders(
+            PairOrderBook(b_orders, s_orders, presorted=presorted), self.fee
+        )
+        self.load_cache(order_book)
 
         # xrate local optima for trivial solution.
-        xrates_obj = [
-            self.solve_trivial(b_orders, s_orders)
-        ]
+        best_trivial_xrate, best_trivial_obj = self.solve_trivial(order_book)
+        xrates_obj = [(best_trivial_xrate, best_trivial_obj)]
 
-        # find the xrate for the trivial solution with maximum objective.
-        best_trivial_xrate = max(xrates_obj, key=lambda x: x[1])[0]
+        # Candidate xrates within the intervals.
+        candidates = []
+        for interval_data in xrate_interval_iterator(
+            order_book, self.fee, best_trivial_xrate
+        ):
+            # Keep the best xrate found so far if the deadline expires.
+            if is_expired(self.deadline):
+                logger.debug("Deadline expired: stopping xrate search.")
+                break
+            candidates += self.collect_interval_candidates(interval_data)
+
+        if self.screening and len(candidates) > 0:
+            approx_objective = ApproxObjective(order_book, self.fee)
+            nr_candidates = len(candidates)
+            candidates = self.screen_candidates(
+                candidates, best_trivial_obj, approx_objective
+            )
+            logger.debug(
+                "Screened %s out of %s exchange rate candidates.",
+                nr_candidates - len(candidates), nr_candidates
+            )
 
-        xrates_obj += [
-            self.solve_interval(interval_data)
-            for interval_data in xrate_interval_iterator(
-                b_orders, s_orders, self.fee, best_trivial_xrate
+        for xrate, root_ids, (nr_b_exec_orders, nr_s_exec_orders) in candidates:
+            if is_expired(self.deadline):
+                logger.debug("Deadline expired: stopping xrate search.")
+                break
+            obj = self.compute_objective_from_columns_cached(
+                xrate, order_book.b_orders, order_book.s_orders,
+                nr_b_exec_orders, nr_s_exec_orders
             )
-        ]
+            logger.debug(
+                "Exchange rate candidate roots%s : (%s, %s)", root_ids, xrate, obj
+            )
+            xrates_obj.append((xrate, obj))
 
         # Filter out invalid xrates.
         xrates_obj = [(xrate, obj) for xrate, obj in xrates_obj if xrate is not None]
@@ -481,13 +815,26 @@ class SymbolicSolver:
             return None, None
 
         # Global optimum is maximum of local optima.
-        return max(xrates_obj, key=lambda xo: xo[1])
+        xrate, obj = max(xrates_obj, key=lambda xo: xo[1])
+
+        return xrate, obj
 
 
-def find_best_xrate(b_orders, s_orders, fee, Solver=SymbolicSolver):
+def find_best_xrate(
+    b_orders, s_orders, fee, Solver=SymbolicSolver, deadline=None, presorted=False,
+    cache=None
+):
     """Find the optimal xrate for executing a set of orders and counter-orders.
 
     Convention: xrate = p(b_buy_token) / p(s_buy_token) = s_buy_amount / b_buy_amount.
+
+    If the (optional) deadline expires, returns the best xrate found so far.
+
+    If b_orders and s_orders are already sorted by execution priority
+    (presorted=True), they are not sorted again.
+
+    If an XrateSearchCache is given, the objectives computed by the previous
+    search using it are reused where the orders did not change.
     """
-    solver = Solver(fee)
-    return solver.solve(b_orders, s_orders)
+    solver = Solver(fee, deadline=deadline, cache=cache)
+    return solver.solve(b_orders, s_orders, presorted=presorted)
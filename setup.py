@@ -23,7 +23,7 @@ setuptools.setup(
         "License :: OSI Approved :: Apache Software License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6.9',
+    python_requires='>=3.7',
     install_requires=[
         "networkx==2.4"
     ],
@@ -0,0 +1,20 @@
+"""Assert that solver stops shortly after the time limit with a valid solution."""
+from dex_open_solver.best_token_pair_solver.solver import main
+from argparse import Namespace
+from time import time
+
+
+def test_does_not_crash_with_time_limit(local_instance):
+    """Asserts that solver returns a solution close to the (short) time limit."""
+    time_limit = 0.1
+    with open(local_instance, 'r') as fd:
+        args = Namespace(
+            instance=fd,
+            solution_filename=None,
+            xrate=None,
+            time_limit=time_limit
+        )
+        tic = time()
+        main(args)
+        tac = time()
+        assert tac - tic <= time_limit + 5
@@ -0,0 +1,29 @@
+"""Assert that an instance has a known solution objective, to catch regressions."""
+from dex_open_solver.best_token_pair_solver.solver import main
+from argparse import Namespace
+from pathlib import Path
+
+
+INSTANCE = Path(__file__).parent / 'instance.json'
+
+EXPECTED_OBJ_VALS = {
+    'volume': '3682950889370168268347905713927823',
+    'utility': '3679123842689694686678892544924827',
+    'utility_disreg': '42155142223939776640669317658740261',
+    'utility_disreg_touched': '2975516389908779938810528112814940',
+    'fees': '3682793665007',
+    'orders_touched': '3'
+}
+
+
+def test_has_expected_objective():
+    """Asserts that instance.json has the same objective values as before."""
+    with open(INSTANCE, 'r') as fd:
+        args = Namespace(
+            instance=fd,
+            solution_filename=None,
+            xrate=None
+        )
+        solution = main(args)
+    obj_vals = {k: str(v) for k, v in solution['objVals'].items()}
+    assert obj_vals == EXPECTED_OBJ_VALS
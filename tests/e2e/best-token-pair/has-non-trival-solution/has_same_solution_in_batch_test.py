@@ -0,0 +1,73 @@
+"""Assert that solving instances in batch finds the same solutions."""
+from dex_open_solver.batch import main
+from dex_open_solver.strategies import solve_instance
+from argparse import Namespace
+from decimal import Decimal as D
+from io import StringIO
+import json
+
+
+def test_has_same_solution_in_batch(local_instance, tmp_path):
+    """Asserts that passed local_instance has the same solution when solved
+    (twice) in a batch."""
+    with open(local_instance, 'r') as fd:
+        instance_json = json.dumps(json.load(fd))
+    solution = json.loads(json.dumps(solve_instance(
+        json.loads(instance_json, parse_float=D), 'best-token-pair', Namespace()
+    )))
+
+    instances_filename = str(tmp_path / 'instances.jsonl')
+    with open(instances_filename, 'w') as instances_file:
+        for _ in range(2):
+            instances_file.write(instance_json + '\n')
+
+    output = StringIO()
+    main(Namespace(
+        instances=instances_filename,
+        strategy='best-token-pair',
+        token_pair=None,
+        workers=2,
+        output=output,
+        time_limit=None
+    ))
+
+    batch_solutions = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [s['solver']['instance'] for s in batch_solutions] == [
+        f'{instances_filename}:1', f'{instances_filename}:2'
+    ]
+    for batch_solution in batch_solutions:
+        assert batch_solution['objVals'] == solution['objVals']
+        assert batch_solution['prices'] == solution['prices']
+
+
+def test_has_same_solution_in_batch_after_read_error(local_instance, tmp_path):
+    """Asserts that an instance that can not be read gets an error solution,
+    and does not stop the batch."""
+    with open(local_instance, 'r') as fd:
+        instance_json = json.dumps(json.load(fd))
+    solution = json.loads(json.dumps(solve_instance(
+        json.loads(instance_json, parse_float=D), 'best-token-pair', Namespace()
+    )))
+
+    instances_dir = tmp_path / 'instances'
+    instances_dir.mkdir()
+    (instances_dir / '1.json').write_bytes(b'\xff')
+    (instances_dir / '2.json').write_text(instance_json)
+
+    output = StringIO()
+    main(Namespace(
+        instances=str(instances_dir),
+        strategy='best-token-pair',
+        token_pair=None,
+        workers=2,
+        output=output,
+        time_limit=None
+    ))
+
+    batch_solutions = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [s['solver']['instance'] for s in batch_solutions] == [
+        str(instances_dir / '1.json'), str(instances_dir / '2.json')
+    ]
+    assert batch_solutions[0]['solver']['exit_status'] == 'error'
+    assert batch_solutions[1]['objVals'] == solution['objVals']
+    assert batch_solutions[1]['prices'] == solution['prices']
@@ -0,0 +1,22 @@
+"""Assert that evaluating token pairs in parallel finds the same solution."""
+from dex_open_solver.best_token_pair_solver.solver import main
+from argparse import Namespace
+
+
+def solve(local_instance, workers):
+    with open(local_instance, 'r') as fd:
+        args = Namespace(
+            instance=fd,
+            solution_filename=None,
+            xrate=None,
+            workers=workers
+        )
+        return main(args)
+
+
+def test_has_same_solution_in_parallel(local_instance):
+    """Asserts that passed local_instance has the same solution with 1 or 2 workers."""
+    sequential_solution = solve(local_instance, workers=1)
+    parallel_solution = solve(local_instance, workers=2)
+    assert parallel_solution['objVals'] == sequential_solution['objVals']
+    assert parallel_solution['prices'] == sequential_solution['prices']
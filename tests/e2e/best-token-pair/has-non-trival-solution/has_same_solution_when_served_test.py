@@ -0,0 +1,80 @@
+"""Assert that the solver service finds the same solution as solving in process."""
+from dex_open_solver.serve import BadRequest, SolverService, parse_solve_query
+from dex_open_solver.strategies import solve_instance
+from argparse import Namespace
+from decimal import Decimal as D
+import asyncio
+import json
+import pytest
+
+
+async def request(socket_path, target, body=b'', expect_continue=False):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    headers = f'POST {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\n'
+    if expect_continue:
+        # Send the body only after the server asks for it.
+        writer.write(f'{headers}Expect: 100-continue\r\n\r\n'.encode())
+        await writer.drain()
+        assert (await reader.readline()).split()[1] == b'100'
+        assert await reader.readline() == b'\r\n'
+        writer.write(body)
+    else:
+        writer.write(f'{headers}\r\n'.encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    response = await reader.read()
+    writer.close()
+    return int(status_line.split()[1]), json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+async def serve_requests(socket_path, requests, max_body_size):
+    service = SolverService(nr_workers=1, max_queue_size=1, max_body_size=max_body_size)
+    server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+    try:
+        async with server:
+            return [await request(socket_path, *r) for r in requests]
+    finally:
+        service.shutdown()
+
+
+def test_has_same_solution_when_served(local_instance, tmp_path):
+    """Asserts that passed local_instance has the same solution when served."""
+    with open(local_instance, 'r') as fd:
+        instance_json = fd.read()
+
+    solution = solve_instance(
+        json.loads(instance_json, parse_float=D), 'best-token-pair', Namespace()
+    )
+    solution = json.loads(json.dumps(solution))
+
+    target = '/solve?strategy=best-token-pair&time_limit=60'
+    max_body_size = len(instance_json.encode())
+    (
+        (status, served_solution),
+        (continue_status, continue_served_solution),
+        (bad_status, _),
+        (too_large_status, _)
+    ) = asyncio.run(serve_requests(
+        str(tmp_path / 'solver.sock'), [
+            (target, instance_json.encode()),
+            (target, instance_json.encode(), True),
+            ('/solve?strategy=unknown', instance_json.encode()),
+            (target, instance_json.encode() + b' ')
+        ],
+        max_body_size
+    ))
+    assert status == 200
+    assert served_solution['objVals'] == solution['objVals']
+    assert served_solution['prices'] == solution['prices']
+    assert continue_status == 200
+    assert continue_served_solution['objVals'] == solution['objVals']
+    assert continue_served_solution['prices'] == solution['prices']
+    assert bad_status == 400
+    assert too_large_status == 413
+
+
+@pytest.mark.parametrize('time_limit', ['-1', '0', 'nan', 'inf', '-inf', 'x'])
+def test_invalid_time_limit_is_bad_request(time_limit):
+    """Asserts that time limits that are not finite positive numbers are rejected."""
+    with pytest.raises(BadRequest):
+        parse_solve_query(f'time_limit={time_limit}', 60)
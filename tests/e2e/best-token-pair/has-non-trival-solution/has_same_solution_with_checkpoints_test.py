@@ -0,0 +1,41 @@
+"""Assert that checkpoint mode finds the same solution and streams token pair results."""
+from dex_open_solver.best_token_pair_solver.solver import main
+from argparse import Namespace
+from io import StringIO
+import json
+
+
+def solve(local_instance, solution_filename=None, **kwargs):
+    with open(local_instance, 'r') as fd:
+        args = Namespace(
+            instance=fd,
+            solution_filename=solution_filename,
+            xrate=None,
+            **kwargs
+        )
+        return main(args)
+
+
+def test_has_same_solution_with_checkpoints(local_instance, tmp_path):
+    """Asserts that passed local_instance has the same solution in checkpoint mode,
+    and that the solution file holds the best token pair result streamed."""
+    solution = solve(local_instance)
+
+    solution_filename = str(tmp_path / 'solution.json')
+    token_pair_results = StringIO()
+    checkpointed_solution = solve(
+        local_instance,
+        solution_filename=solution_filename,
+        checkpoint=True,
+        token_pair_results=token_pair_results
+    )
+    assert checkpointed_solution['objVals'] == solution['objVals']
+    assert checkpointed_solution['prices'] == solution['prices']
+
+    with open(solution_filename, 'r') as solution_file:
+        assert json.load(solution_file)['solver']['exit_status'] == 'completed'
+
+    results = [json.loads(line) for line in token_pair_results.getvalue().splitlines()]
+    assert len(results) > 0
+    assert all(set(result.keys()) == {'token_pair', 'objective', 'runtime'}
+               for result in results)
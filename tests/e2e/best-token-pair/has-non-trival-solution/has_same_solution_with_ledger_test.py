@@ -0,0 +1,29 @@
+"""Assert that resuming from a ledger of a previous run finds the same solution."""
+from dex_open_solver.best_token_pair_solver.solver import main
+from argparse import Namespace
+
+
+def solve(local_instance, ledger):
+    with open(local_instance, 'r') as fd:
+        args = Namespace(
+            instance=fd,
+            solution_filename=None,
+            xrate=None,
+            ledger=ledger
+        )
+        return main(args)
+
+
+def test_has_same_solution_with_ledger(local_instance, tmp_path):
+    """Asserts that passed local_instance has the same solution when all token
+    pairs are restored from the ledger."""
+    ledger = str(tmp_path / 'ledger.json')
+    first_solution = solve(local_instance, ledger)
+    with open(ledger, 'r') as ledger_file:
+        nr_entries = len(ledger_file.readlines())
+    resumed_solution = solve(local_instance, ledger)
+    with open(ledger, 'r') as ledger_file:
+        assert len(ledger_file.readlines()) == nr_entries
+    assert resumed_solution['objVals'] == first_solution['objVals']
+    assert resumed_solution['prices'] == first_solution['prices']
+    assert resumed_solution['orders'] == first_solution['orders']
@@ -5,7 +5,8 @@ from hypothesis import strategies as s
 
 from dex_open_solver.core.api import Fee
 from dex_open_solver.core.order_util import RationalTraits
-from dex_open_solver.core.orderbook import count_nr_exec_orders
+from dex_open_solver.core.orderbook import (count_nr_exec_orders,
+                                            sorted_orders_by_exec_priority)
 from dex_open_solver.core.validation import validate
 from dex_open_solver.token_pair_solver.amount import compute_buy_amounts
 from tests.unit.amount_test_examples import (
@@ -66,3 +67,24 @@ def compute_buy_amounts_helper(b_orders, s_orders, xrate, max_nr_exec_orders):
 @examples(min_tradable_amount_constraint_examples)
 def test_compute_buy_amounts_small(b_orders, s_orders, xrate, max_nr_exec_orders):
     compute_buy_amounts_helper(b_orders, s_orders, xrate, max_nr_exec_orders)
+
+
+# Presorted orders must lead to the same buy amounts as unsorted orders.
+@given(
+    random_small_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='T1'),
+    random_small_order_list(min_size=1, max_size=4, buy_token='T1', sell_token='T0'),
+    random_xrate(),
+    s.integers(min_value=2, max_value=8)
+)
+def test_compute_buy_amounts_presorted(b_orders, s_orders, xrate, max_nr_exec_orders):
+    compute_buy_amounts(xrate, b_orders, s_orders, fee, max_nr_exec_orders)
+    buy_amounts = [order.buy_amount for order in b_orders + s_orders]
+
+    compute_buy_amounts(
+        xrate,
+        sorted_orders_by_exec_priority(b_orders),
+        sorted_orders_by_exec_priority(s_orders),
+        fee, max_nr_exec_orders,
+        presorted=True
+    )
+    assert [order.buy_amount for order in b_orders + s_orders] == buy_amounts
@@ -0,0 +1,74 @@
+from copy import deepcopy
+from fractions import Fraction as F
+from math import ceil
+
+from hypothesis import given, settings
+
+from dex_open_solver.best_token_pair_solver.bound import \
+    compute_objective_upper_bound
+from dex_open_solver.core.api import Fee
+from dex_open_solver.core.config import Config
+from dex_open_solver.core.order import Order
+from dex_open_solver.core.orderbook import compute_objective, update_accounts
+from dex_open_solver.token_pair_solver.solver import (
+    solve_token_pair_and_fee_token_economic_viable
+)
+from tests.unit.solver_test_examples import solve_token_pair_and_fee_token_examples
+from tests.unit.strategies import random_order_list
+from tests.unit.util import examples
+
+
+def with_integer_min_buy_amounts(orders):
+    """Round limit xrates so that orders have integer min buy amounts, as
+    orders loaded from an instance do."""
+    return [
+        Order(
+            buy_token=o.buy_token,
+            sell_token=o.sell_token,
+            max_sell_amount=o.max_sell_amount,
+            max_xrate=F(o.max_sell_amount, ceil(o.max_sell_amount / o.max_xrate))
+        ) for o in orders
+    ]
+
+
+@given(
+    random_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=4, buy_token='T1', sell_token='T0'),
+    random_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='F')
+)
+@examples(solve_token_pair_and_fee_token_examples)
+@settings(deadline=None)
+def test_objective_upper_bound(b_orders, s_orders, f_orders):
+    """Test if the objective of the token pair solution is within the upper bound."""
+    b_orders, s_orders, f_orders = map(
+        with_integer_min_buy_amounts, (b_orders, s_orders, f_orders)
+    )
+    fee = Fee(token='F', value=F(1, 1000))
+    token_pair = ('T0', 'T1')
+    Config.MIN_AVERAGE_ORDER_FEE = 0
+    Config.MIN_ABSOLUTE_ORDER_FEE = 0
+
+    accounts = {
+        'A': {
+            'T0': sum(s_order.max_sell_amount for s_order in s_orders),
+            'T1': sum(b_order.max_sell_amount for b_order in b_orders),
+            'F': sum(f_order.max_sell_amount for f_order in f_orders)
+        }
+    }
+    for order in b_orders + s_orders + f_orders:
+        order.account_id = 'A'
+
+    objective_ub = compute_objective_upper_bound(
+        token_pair, b_orders, s_orders, f_orders, fee
+    )
+
+    orders, prices = solve_token_pair_and_fee_token_economic_viable(
+        token_pair, accounts, b_orders, s_orders, f_orders, fee
+    )
+
+    accounts_updated = deepcopy(accounts)
+    update_accounts(accounts_updated, orders)
+    touched_orders = [o for o in orders if o.buy_amount > 0]
+    objective = compute_objective(prices, accounts_updated, touched_orders, fee)
+
+    assert objective <= objective_ub
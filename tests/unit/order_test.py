@@ -0,0 +1,122 @@
+import pickle
+from copy import copy, deepcopy
+from fractions import Fraction as F
+
+from hypothesis import given
+from hypothesis import strategies as s
+
+from dex_open_solver.core.api import Fee
+from dex_open_solver.core.config import Config
+from dex_open_solver.core.order_util import FixedPointTraits, RationalTraits
+from dex_open_solver.core.orderbook import (
+    compute_approx_economic_viable_subset, compute_average_order_fee,
+    restore_execution, snapshot_execution, snapshot_solution
+)
+from tests.unit.strategies import random_order, random_order_list, random_xrate
+
+fee = Fee(token='T0', value=F(1, 1000))
+
+
+@given(random_order(), random_xrate())
+def test_utility_term_at_buy_amount(order, xrate):
+    """Evaluating an order at a given buy amount must match evaluating a copy
+    of the order with that buy amount."""
+    buy_amount = (order.max_sell_amount / xrate) * (1 - fee.value)
+    assert RationalTraits.compute_utility_term(
+        order, xrate, 1, fee, buy_amount=buy_amount
+    ) == RationalTraits.compute_utility_term(
+        order.with_buy_amount(buy_amount), xrate, 1, fee
+    )
+
+
+@given(random_order())
+def test_copies_are_equivalent(order):
+    order.buy_amount = order.max_sell_amount / order.max_xrate
+    order.sell_amount = order.max_sell_amount
+    for order_copy in [copy(order), deepcopy(order), pickle.loads(pickle.dumps(order))]:
+        assert order_copy is not order
+        assert str(order_copy) == str(order)
+        assert order_copy.id == order.id
+        assert order_copy.original_max_sell_amount == order.original_max_sell_amount
+
+
+@given(random_order(), random_xrate())
+def test_fixed_point_utility_terms(order, xrate):
+    """Fixed point utility terms must be conservative roundings of the rational ones."""
+    order.buy_amount = (order.max_sell_amount / xrate) * (1 - fee.value) / 2
+    eps = F(1, FixedPointTraits.DENOMINATOR)
+
+    u = RationalTraits.compute_utility_term(order, xrate, 1, fee)
+    u_fixed = FixedPointTraits.compute_utility_term(order, xrate, 1, fee)
+    assert u - eps < u_fixed <= u
+
+    umax = RationalTraits.compute_max_utility_term(order, xrate, 1, fee)
+    umax_fixed = FixedPointTraits.compute_max_utility_term(order, xrate, 1, fee)
+    assert umax <= umax_fixed < umax + eps
+
+    sell_amount = RationalTraits.compute_sell_from_buy_amount(
+        order.buy_amount, xrate, fee
+    )
+    sell_amount_fixed = FixedPointTraits.compute_sell_from_buy_amount(
+        order.buy_amount, xrate, fee
+    )
+    assert sell_amount - eps < sell_amount_fixed <= sell_amount
+
+
+@given(random_order_list(min_size=1, max_size=10))
+def test_execution_snapshots(orders):
+    """Snapshots must not be affected by later executions of the orders."""
+    for order in orders:
+        order.buy_amount = order.max_sell_amount / order.max_xrate
+        order.sell_amount = order.max_sell_amount
+    execution = snapshot_execution(orders)
+    solution_orders, prices = snapshot_solution((orders, {'T0': 1}))
+    expected = [str(order) for order in orders]
+
+    for order in orders:
+        order.buy_amount = 0
+        order.sell_amount = 0
+    assert [str(order) for order in solution_orders] == expected
+    assert [order.id for order in solution_orders] == [order.id for order in orders]
+
+    restore_execution(orders, execution)
+    assert [str(order) for order in orders] == expected
+
+
+@given(
+    random_order_list(min_size=1, max_size=10, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=10, buy_token='T1', sell_token='T0'),
+    s.lists(s.fractions(min_value=0, max_value=1), min_size=20, max_size=20),
+    s.fractions(min_value=F(1, 10), max_value=10),
+    s.integers(min_value=1, max_value=10**6)
+)
+def test_approx_economic_viable_subset(
+    b_orders, s_orders, executed_fractions, xrate, min_average_order_fee
+):
+    """The subset must be the longest prefix of the executed orders by decreasing
+    volume, such that all smaller prefixes satisfy the minimum average fee, plus
+    the next order."""
+    orders = b_orders + s_orders
+    for order, executed_fraction in zip(orders, executed_fractions):
+        order.buy_amount = order.max_sell_amount / order.max_xrate * executed_fraction
+    prices = {'T0': F(1), 'T1': xrate}
+    Config.MIN_AVERAGE_ORDER_FEE = min_average_order_fee
+    Config.MIN_ABSOLUTE_ORDER_FEE = 0
+
+    expected = sorted(
+        [o for o in orders if o.buy_amount > 0],
+        key=lambda o: o.volume(prices),
+        reverse=True
+    )
+    i = 1
+    while i < len(expected) and compute_average_order_fee(
+        expected[:i], prices, fee, None
+    ) >= min_average_order_fee:
+        i += 1
+    expected = expected[:i]
+    if len({o.buy_token for o in expected}) == 1:
+        expected = []
+
+    assert [o.id for o in compute_approx_economic_viable_subset(
+        orders, prices, fee, None
+    )] == [o.id for o in expected]
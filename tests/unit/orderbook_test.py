@@ -0,0 +1,75 @@
+from fractions import Fraction as F
+
+from hypothesis import given
+from hypothesis import strategies as s
+
+from dex_open_solver.core.api import Fee
+from dex_open_solver.token_pair_solver.orderbook import (
+    OrderColumns, PairOrderBook, count_orders_satisfying_xrate,
+    prune_unrealizable_orders, prune_unrealizable_pair_orders
+)
+from tests.unit.strategies import random_order_list, random_xrate
+
+fee = Fee(token='T0', value=F(1, 1000))
+
+
+@given(
+    random_order_list(min_size=1, max_size=10, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=10, buy_token='T1', sell_token='T0')
+)
+def test_prune_unrealizable_pair_orders(b_orders, s_orders):
+    order_book = prune_unrealizable_pair_orders(PairOrderBook(b_orders, s_orders), fee)
+    b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, fee)
+    assert {o.id for o in order_book.b_orders} == {o.id for o in b_orders}
+    assert {o.id for o in order_book.s_orders} == {o.id for o in s_orders}
+
+
+@given(
+    random_order_list(min_size=1, max_size=10),
+    s.integers(min_value=0, max_value=10),
+    s.fractions(min_value=0),
+    s.fractions(min_value=0)
+)
+def test_partially_executable_range(orders, nr_orders, sell_amount_lb, sell_amount_ub):
+    columns = OrderColumns(orders)
+    nr_orders = min(nr_orders, len(columns))
+    assert list(columns.partially_executable_range(
+        nr_orders, sell_amount_lb, sell_amount_ub
+    )) == [
+        i for i in range(nr_orders)
+        if sum(o.max_sell_amount for o in columns[:i]) <= sell_amount_ub
+        and sum(o.max_sell_amount for o in columns[:i + 1]) >= sell_amount_lb
+    ]
+
+
+@given(
+    random_order_list(min_size=1, max_size=10),
+    s.integers(min_value=0, max_value=10),
+    s.integers(min_value=0, max_value=10)
+)
+def test_range_sums(orders, start, stop):
+    columns = OrderColumns(orders)
+    start, stop = sorted([min(start, len(columns)), min(stop, len(columns))])
+    assert columns.sum_max_sell_amounts(start, stop) \
+        == sum(o.max_sell_amount for o in columns[start:stop])
+    assert columns.sum_min_buy_amounts(start, stop) \
+        == sum(o.max_sell_amount / o.max_xrate for o in columns[start:stop])
+    assert columns.head(stop).sum_min_buy_amounts(start) \
+        == columns.sum_min_buy_amounts(start, stop)
+
+
+@given(
+    random_order_list(min_size=0, max_size=10),
+    random_xrate()
+)
+def test_count_orders_satisfying_xrate(orders, xrate):
+    columns = OrderColumns(orders)
+    # Also test xrates at which some orders are exactly at their limit.
+    for xrate in [xrate] + [order.max_xrate * (1 - fee.value) for order in orders]:
+        nr_orders = count_orders_satisfying_xrate(orders, xrate, fee)
+        assert count_orders_satisfying_xrate(
+            columns.orders, xrate, fee, presorted=True
+        ) == nr_orders
+        assert columns.count_orders_with_max_xrate_at_least(
+            xrate / (1 - fee.value)
+        ) == nr_orders
@@ -0,0 +1,48 @@
+from hypothesis import given
+from hypothesis import strategies as s
+
+from dex_open_solver.best_token_pair_solver.schedule import schedule_token_pairs
+
+
+@given(
+    s.dictionaries(
+        s.tuples(s.sampled_from('ABCD'), s.sampled_from('ABCD')),
+        s.tuples(
+            s.integers(min_value=0, max_value=10), s.integers(min_value=1, max_value=10)
+        )
+    ),
+    s.none() | s.integers(min_value=0, max_value=30)
+)
+def test_schedule_token_pairs(token_pair_ubs_and_costs, time_budget):
+    """Token pairs are solved by decreasing objective upper bound, deferring those
+    that do not fit in the time budget after the ones before them."""
+    token_pairs = list(token_pair_ubs_and_costs.keys())
+    objective_ubs = {tp: ub for tp, (ub, _) in token_pair_ubs_and_costs.items()}
+    costs = {tp: cost for tp, (_, cost) in token_pair_ubs_and_costs.items()}
+
+    schedule = schedule_token_pairs(token_pairs, objective_ubs, costs, time_budget)
+    assert sorted(schedule) == sorted(token_pairs)
+
+    if time_budget is None:
+        scheduled, deferred = schedule, []
+    else:
+        nr_scheduled = 0
+        total_cost = 0
+        while nr_scheduled < len(schedule) \
+                and total_cost + costs[schedule[nr_scheduled]] <= time_budget:
+            total_cost += costs[schedule[nr_scheduled]]
+            nr_scheduled += 1
+        scheduled, deferred = schedule[:nr_scheduled], schedule[nr_scheduled:]
+        # Deferred token pairs did not fit in what was left of the budget.
+        for token_pair in deferred:
+            budget_left = time_budget - sum(
+                costs[tp] for tp in scheduled
+                if (-objective_ubs[tp], costs[tp], tp)
+                < (-objective_ubs[token_pair], costs[token_pair], token_pair)
+            )
+            assert costs[token_pair] > budget_left
+
+    for token_pairs in (scheduled, deferred):
+        assert token_pairs == sorted(
+            token_pairs, key=lambda tp: (-objective_ubs[tp], costs[tp], tp)
+        )
@@ -1,17 +1,21 @@
 from fractions import Fraction as F
 
 from hypothesis import event, given
+from hypothesis import strategies as s
 
 from dex_open_solver.core.api import Fee
 from dex_open_solver.core.config import Config
-from dex_open_solver.core.orderbook import count_nr_exec_orders
+from dex_open_solver.core.orderbook import (count_nr_exec_orders,
+                                            sorted_orders_by_exec_priority)
+from dex_open_solver.token_pair_solver.round import rounding_buffer
 from dex_open_solver.token_pair_solver.solver import (
+    golden_section_search_nr_exec_f_orders, scan_nr_exec_f_orders,
     solve_token_pair_and_fee_token_economic_viable
 )
 from tests.unit.solver_test_examples import (
     min_average_order_fee_constraint_examples,
     solve_token_pair_and_fee_token_examples)
-from tests.unit.strategies import random_order_list
+from tests.unit.strategies import random_order_list, random_xrate
 from tests.unit.util import examples
 
 
@@ -60,6 +64,25 @@ def test_solve_token_pair_and_fee_token(b_orders, s_orders, f_orders):
     solve_token_pair_and_fee_token_helper(b_orders, s_orders, f_orders, fee)
 
 
+# Test main function with the objective computed in fixed point arithmetic
+# (the solution is still validated exactly).
+@given(
+    random_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=4, buy_token='T1', sell_token='T0'),
+    random_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='F')
+)
+@examples(solve_token_pair_and_fee_token_examples)
+def test_solve_token_pair_and_fee_token_fixed_point(b_orders, s_orders, f_orders):
+    fee = Fee(token='F', value=F(1, 1000))
+    Config.MIN_AVERAGE_ORDER_FEE = 0
+    Config.MIN_ABSOLUTE_ORDER_FEE = 0
+    Config.FIXED_POINT_OBJECTIVE = True
+    try:
+        solve_token_pair_and_fee_token_helper(b_orders, s_orders, f_orders, fee)
+    finally:
+        Config.FIXED_POINT_OBJECTIVE = False
+
+
 # Test minimum average fee per order constraint.
 @given(
     random_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='T1'),
@@ -94,3 +117,63 @@ def test_min_absolute_order_fee_constraint(
     Config.MIN_ABSOLUTE_ORDER_FEE = int(10e18)
 
     solve_token_pair_and_fee_token_helper(b_orders, s_orders, f_orders, fee)
+
+
+# Test that the search on the number of executed f_orders finds an optimal
+# number of f_orders, for objectives satisfying its assumptions.
+@given(
+    s.integers(min_value=0, max_value=10),
+    s.integers(min_value=0, max_value=10),
+    s.integers(min_value=0, max_value=10),
+    s.integers(min_value=0, max_value=10),
+    s.integers(min_value=0, max_value=10)
+)
+def test_golden_section_search_nr_exec_f_orders(
+    min_nr_exec_f_orders, nr_infeasible, nr_increasing, nr_decreasing, nr_constant
+):
+    objectives = [None] * nr_infeasible \
+        + list(range(nr_increasing)) \
+        + list(range(nr_increasing - 2, nr_increasing - 2 - nr_decreasing, -1))
+    objectives += objectives[-1:] * nr_constant
+    max_nr_exec_f_orders = min_nr_exec_f_orders + len(objectives) - 1
+
+    def evaluate(nr_exec_f_orders):
+        return objectives[nr_exec_f_orders - min_nr_exec_f_orders]
+
+    best_nr_exec_f_orders = scan_nr_exec_f_orders(
+        evaluate, min_nr_exec_f_orders, max_nr_exec_f_orders
+    )
+    nr_exec_f_orders = golden_section_search_nr_exec_f_orders(
+        evaluate, min_nr_exec_f_orders, max_nr_exec_f_orders
+    )
+    if best_nr_exec_f_orders is None:
+        assert nr_exec_f_orders is None
+    else:
+        assert evaluate(nr_exec_f_orders) == evaluate(best_nr_exec_f_orders)
+
+
+# Test that the orders remain sorted by execution priority after reducing their
+# max_sell_amounts by the rounding buffer, as solve_token_pair_and_fee_token
+# assumes. Orders whose max_sell_amount drops to zero are never executed, so their
+# position does not matter.
+@given(
+    random_order_list(min_size=1, max_size=6, buy_token='T0', sell_token='T1'),
+    random_order_list(
+        min_size=1, max_size=6, buy_token='T0', sell_token='T1', max_xrate=F(1)
+    ),
+    random_order_list(min_size=1, max_size=6, buy_token='T1', sell_token='T0'),
+    random_xrate()
+)
+def test_rounding_buffer_keeps_exec_priority(
+    b_orders, b_orders_with_same_xrate, s_orders, xrate
+):
+    fee = Fee(token='F', value=F(1, 1000))
+    b_orders = sorted_orders_by_exec_priority(b_orders + b_orders_with_same_xrate)
+    s_orders = sorted_orders_by_exec_priority(s_orders)
+
+    with rounding_buffer(
+        ('T0', 'T1'), b_orders, s_orders, xrate, Config.FEE_TOKEN_PRICE, fee
+    ):
+        for orders in [b_orders, s_orders]:
+            orders = [order for order in orders if order.max_sell_amount > 0]
+            assert sorted_orders_by_exec_priority(orders) == orders
@@ -1,13 +1,19 @@
 from fractions import Fraction as F
 
 from hypothesis import assume, given, settings
+from hypothesis import strategies as s
 
 from dex_open_solver.core.api import Fee
 from dex_open_solver.core.config import Config
 from dex_open_solver.token_pair_solver.amount import compute_buy_amounts
-from dex_open_solver.token_pair_solver.orderbook import compute_objective_rational
-from dex_open_solver.token_pair_solver.xrate import find_best_xrate
-from tests.unit.strategies import random_order_list
+from dex_open_solver.token_pair_solver.orderbook import (PairOrderBook,
+                                                         compute_objective_rational,
+                                                         prune_unrealizable_orders)
+from dex_open_solver.token_pair_solver.screening import ApproxObjective
+from dex_open_solver.token_pair_solver.xrate import (SymbolicSolver, XrateSearchCache,
+                                                     find_best_xrate, snap_xrate,
+                                                     xrate_interval_iterator)
+from tests.unit.strategies import random_order_list, random_xrate
 from tests.unit.util import examples
 from tests.unit.xrate_test_examples import find_best_xrate_examples
 
@@ -57,3 +63,176 @@ def test_find_best_xrate(b_orders, s_orders):
         objective = compute_objective(b_orders, s_orders, xrate, fee)
         assert objective <= optimal_objective
         xrate += step
+
+
+@given(
+    random_order_list(min_size=1, max_size=6, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=6, buy_token='T1', sell_token='T0')
+)
+@examples(find_best_xrate_examples)
+@settings(deadline=None)
+def test_find_best_xrate_screening(b_orders, s_orders):
+    """Screening candidate xrates must not change the result."""
+    assume(
+        min(1 / (s_o.max_xrate * (1 - fee.value)) for s_o in s_orders)
+        <= max(b_o.max_xrate * (1 - fee.value) for b_o in b_orders)
+    )
+    assert SymbolicSolver(fee, screening=True).solve(b_orders, s_orders) \
+        == SymbolicSolver(fee, screening=False).solve(b_orders, s_orders)
+
+
+@given(
+    random_order_list(min_size=1, max_size=6, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=6, buy_token='T1', sell_token='T0')
+)
+@examples(find_best_xrate_examples)
+@settings(deadline=None)
+def test_approx_objective(b_orders, s_orders):
+    """The approximate objective must be within its error bound of the exact one."""
+    order_book = PairOrderBook(b_orders, s_orders)
+    solver = SymbolicSolver(fee)
+    approx_objective = ApproxObjective(order_book, fee)
+    for interval_data in xrate_interval_iterator(order_book, fee):
+        xrate_lb, xrate_ub = interval_data.xrate
+        xrates = [xrate for xrate, _ in solver.collect_local_optima_within_interval(
+            interval_data
+        )] + [(xrate_lb + xrate_ub) / 2]
+        for xrate in xrates:
+            approx_obj = approx_objective(xrate, *interval_data.nr_exec_orders)
+            if approx_obj is None:
+                continue
+            obj, error = approx_obj
+            assert abs(F(obj) - solver.compute_objective_from_columns(
+                xrate, order_book.b_orders, order_book.s_orders,
+                *interval_data.nr_exec_orders
+            )) <= error
+
+
+@given(
+    random_order_list(min_size=1, max_size=4, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=4, buy_token='T1', sell_token='T0')
+)
+def test_approx_objective_overflow(b_orders, s_orders):
+    """Xrates that overflow floats are left to the exact evaluation."""
+    approx_objective = ApproxObjective(PairOrderBook(b_orders, s_orders), fee)
+    assert approx_objective(F(10**400), len(b_orders), 0) is None
+    assert approx_objective(F(1, 10**400), 0, len(s_orders)) is None
+
+
+@given(
+    random_order_list(min_size=1, max_size=6, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=6, buy_token='T1', sell_token='T0')
+)
+@examples(find_best_xrate_examples)
+@settings(deadline=None)
+def test_find_best_xrate_screening_config(b_orders, s_orders):
+    """Config.XRATE_SEARCH_SCREENING enables screening in find_best_xrate."""
+    assume(
+        min(1 / (s_o.max_xrate * (1 - fee.value)) for s_o in s_orders)
+        <= max(b_o.max_xrate * (1 - fee.value) for b_o in b_orders)
+    )
+    result = find_best_xrate(b_orders, s_orders, fee)
+    Config.XRATE_SEARCH_SCREENING = True
+    try:
+        assert SymbolicSolver(fee).screening
+        assert find_best_xrate(b_orders, s_orders, fee) == result
+    finally:
+        Config.XRATE_SEARCH_SCREENING = False
+
+
+@given(
+    random_xrate(), random_xrate(), random_xrate(),
+    s.integers(min_value=1, max_value=10**18)
+)
+def test_snap_xrate(xrate1, xrate2, xrate3, max_denominator):
+    xrate_lb, xrate, xrate_ub = sorted([xrate1, xrate2, xrate3])
+    assume(xrate_lb < xrate < xrate_ub)
+    snapped_xrate = snap_xrate(xrate, xrate_lb, xrate_ub, max_denominator)
+    assert xrate_lb < snapped_xrate < xrate_ub
+    assert snapped_xrate == xrate or snapped_xrate.denominator <= max_denominator
+
+
+@given(
+    random_order_list(min_size=1, max_size=6, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=6, buy_token='T1', sell_token='T0')
+)
+@examples(find_best_xrate_examples)
+@settings(deadline=None)
+def test_compute_objective_from_columns(b_orders, s_orders):
+    """The objective computed from the columns must match compute_objective."""
+    order_book = PairOrderBook(b_orders, s_orders)
+    solver = SymbolicSolver(fee)
+    for interval_data in xrate_interval_iterator(order_book, fee):
+        xrate_lb, xrate_ub = interval_data.xrate
+        nr_b_exec_orders, nr_s_exec_orders = interval_data.nr_exec_orders
+        xrates = [xrate for xrate, _ in solver.collect_local_optima_within_interval(
+            interval_data
+        )] + [(xrate_lb + xrate_ub) / 2]
+        for xrate in xrates:
+            assert solver.compute_objective_from_columns(
+                xrate, order_book.b_orders, order_book.s_orders,
+                nr_b_exec_orders, nr_s_exec_orders
+            ) == solver.compute_objective(
+                xrate,
+                order_book.b_orders[:nr_b_exec_orders],
+                order_book.s_orders[:nr_s_exec_orders]
+            )
+
+
+@given(
+    random_order_list(min_size=1, max_size=6, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=6, buy_token='T1', sell_token='T0')
+)
+@examples(find_best_xrate_examples)
+@settings(deadline=None)
+def test_compute_objectives_by_sweep(b_orders, s_orders):
+    """The objectives computed by the sweep must match compute_objective."""
+    order_book = PairOrderBook(b_orders, s_orders)
+    solver = SymbolicSolver(fee)
+    xrates = [xrate for xrate, _ in solver.collect_local_optima_for_trivial_solution(
+        order_book.b_orders, order_book.s_orders
+    )]
+    assert solver.compute_objectives_by_sweep(xrates, order_book) == [
+        solver.compute_objective(
+            xrate, order_book.b_orders.orders, order_book.s_orders.orders
+        )
+        for xrate in xrates
+    ]
+
+
+def test_solve_trivial_bin_search_returns_local_optimum():
+    """The trivial solution xrate is selected by binary search, as before the
+    objectives were computed by a sweep, even if it is not the maximum."""
+    solver = SymbolicSolver(fee)
+    assert solver.solve_trivial_bin_search([0, 1, 5, 2, 3, 4]) == 5
+    assert solver.solve_trivial_bin_search([0, 5, 1, 2, 3, 2]) == 4
+    assert solver.solve_trivial_bin_search([0, 1, 2, 3, 2]) == 3
+    assert solver.solve_trivial_bin_search([2, 1]) == 0
+
+
+@given(
+    random_order_list(min_size=1, max_size=10, buy_token='T0', sell_token='T1'),
+    random_order_list(min_size=1, max_size=10, buy_token='T1', sell_token='T0'),
+    s.integers(min_value=0)
+)
+@settings(deadline=None)
+def test_find_best_xrate_with_cache(b_orders, s_orders, removed_order_i):
+    """The xrate search must find the same solution with a cache of the search
+    before removing an order as without it."""
+    b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, fee)
+    assume(len(b_orders) > 0 and len(s_orders) > 0)
+    cache = XrateSearchCache()
+    find_best_xrate(b_orders, s_orders, fee, cache=cache)
+
+    orders = b_orders + s_orders
+    removed_order = orders[removed_order_i % len(orders)]
+    b_orders = [o for o in b_orders if o is not removed_order]
+    s_orders = [o for o in s_orders if o is not removed_order]
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return
+    b_orders, s_orders = prune_unrealizable_orders(b_orders, s_orders, fee)
+    if len(b_orders) == 0 or len(s_orders) == 0:
+        return
+
+    assert find_best_xrate(b_orders, s_orders, fee, cache=cache) \
+        == find_best_xrate(b_orders, s_orders, fee)